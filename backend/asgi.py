@@ -5,6 +5,17 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The web process (Procfile) runs backend.wsgi under sync gunicorn. Under ASGI,
+Django buffers synchronous StreamingHttpResponse iterators in memory before
+sending them, which breaks the streamed PDF ZIP and CSV exports. Serve only the
+/api/invoicing/async/ routes from an ASGI deployment, e.g.:
+
+    DB_CONN_MAX_AGE=0 gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+and route the rest of the API to the WSGI process. Compare both with
+`python manage.py benchmark_http` at the same worker count before moving
+traffic.
 """
 
 import os
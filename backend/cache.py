@@ -0,0 +1,10 @@
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_process_local(cache):
+    """
+    Si el backend de caché vive en la memoria de cada proceso (LocMemCache, el
+    predeterminado): lo que un worker invalida no se invalida en los demás, por
+    lo que los datos de permisos solo se pueden cachear unos pocos segundos.
+    """
+    return isinstance(cache, LocMemCache)
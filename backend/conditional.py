@@ -0,0 +1,103 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """ETag (entre comillas) a partir de los valores que definen la representación."""
+    raw = '|'.join(str(part) for part in parts)
+    return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Respuesta 304 si el cliente ya tiene esta versión (If-None-Match /
+    If-Modified-Since), o None. `last_modified` es un timestamp en segundos,
+    la resolución de Last-Modified; el ETag distingue cambios más finos.
+    """
+    response = get_conditional_response(
+        getattr(request, '_request', request),
+        etag=etag,
+        last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional para `list` y `retrieve` con ETag basado en `updated_at`.
+
+    - Detalle: ETag de `get_etag_parts(objeto)` (id y `updated_at`) y
+      Last-Modified de `get_last_modified(objeto)` (`updated_at`).
+    - Listado: ETag de las filas de la página que se sirve y de los datos de
+      paginación (enlaces y total, si se pidió). No se agrega sobre todo el
+      queryset: la página ya se consulta para responder, así que validar no
+      añade consultas. Sin Last-Modified, porque el máximo `updated_at` de la
+      página no cambia si se elimina una de sus filas.
+
+    Si el cliente envía un validador vigente se responde 304 sin serializar.
+    Las vistas añaden partes con `get_etag_parts` (datos relacionados de cada
+    objeto que se incluyen en la respuesta) y `get_etag_extra` (partes comunes
+    a toda la respuesta).
+    """
+    updated_at_field = 'updated_at'
+
+    def get_etag_extra(self):
+        return []
+
+    def get_etag_parts(self, obj):
+        updated_at = getattr(obj, self.updated_at_field)
+        return [obj.pk, updated_at.isoformat() if updated_at else None]
+
+    def get_last_modified(self, obj):
+        """Fecha de la última modificación, o None si la respuesta incluye datos sin fecha."""
+        return getattr(obj, self.updated_at_field)
+
+    def _etag(self, *parts):
+        return make_etag(self.request.accepted_renderer.format, *parts, *self.get_etag_extra())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        parts = [self.get_etag_parts(obj) for obj in rows]
+        if page is not None:
+            # Enlaces y total de la paginación (sin consultas: ya se calcularon)
+            pagination = self.get_paginated_response([]).data
+            parts.append(sorted((key, value) for key, value in pagination.items() if key != 'results'))
+        etag = self._etag(*parts)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        updated_at = self.get_last_modified(instance)
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+        etag = self._etag(*self.get_etag_parts(instance))
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, last_modified)
@@ -0,0 +1,197 @@
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.smtp import EmailBackend
+
+
+def _setting(name, default):
+    return getattr(settings, 'EMAIL_POOL', {}).get(name, default)
+
+
+class PooledConnection:
+    """Conexión SMTP autenticada con su uso, para decidir si se reutiliza."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+    def is_closed(self):
+        # smtplib deja `sock` en None cuando el servidor cierra la conexión
+        return getattr(self.connection, 'sock', None) is None
+
+    def quit(self):
+        try:
+            self.connection.quit()
+        except (smtplib.SMTPException, OSError):
+            self.connection.close()
+
+
+class SMTPConnectionPool:
+    """
+    Conexiones SMTP abiertas y sin usar, por servidor y usuario.
+
+    Antes de reutilizar una conexión se comprueba que siga viva: se descarta
+    si lleva más de MAX_IDLE segundos sin uso (el servidor ya la habrá
+    cerrado) y, si lleva más de CHECK_AFTER, se verifica con NOOP.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+
+    def acquire(self, key):
+        """Conexión viva del pool para `key`, o None."""
+        while True:
+            with self.lock:
+                entries = self.idle.get(key)
+                if not entries:
+                    return None
+                # La usada más recientemente es la que más probablemente sigue abierta
+                entry = entries.pop()
+            if self.is_healthy(entry):
+                return entry
+            entry.quit()
+
+    def is_healthy(self, entry):
+        idle = time.monotonic() - entry.last_used
+        if entry.is_closed() or idle > _setting('MAX_IDLE', 60):
+            return False
+        if idle > _setting('CHECK_AFTER', 5):
+            try:
+                code, _ = entry.connection.noop()
+            except (smtplib.SMTPException, OSError):
+                return False
+            return code == 250
+        return True
+
+    def release(self, key, entry):
+        """
+        Devuelve la conexión al pool. Returns False si no se conserva (cerrada,
+        con MAX_MESSAGES enviados o con el pool lleno): el llamador la cierra.
+        """
+        if entry.is_closed() or entry.sent >= _setting('MAX_MESSAGES', 100):
+            return False
+        entry.last_used = time.monotonic()
+        with self.lock:
+            entries = self.idle.setdefault(key, [])
+            if len(entries) >= _setting('MAX_SIZE', 4):
+                return False
+            entries.append(entry)
+        return True
+
+    def clear(self):
+        with self.lock:
+            entries = [entry for key_entries in self.idle.values() for entry in key_entries]
+            self.idle.clear()
+        for entry in entries:
+            entry.quit()
+
+
+_pool = SMTPConnectionPool()
+
+
+class PooledEmailBackend(EmailBackend):
+    """
+    Backend SMTP que reutiliza conexiones autenticadas entre envíos (ver
+    EMAIL_POOL), en lugar de abrir una conexión TLS y autenticarse por cada
+    email como el backend SMTP de Django.
+
+    `close()` devuelve la conexión al pool del proceso en lugar de cerrarla,
+    por lo que `EmailMessage.send()` también la reutiliza. Cada conexión envía
+    como máximo MAX_MESSAGES mensajes (límite habitual de los servidores, p. ej.
+    Gmail) y, si el servidor la cierra durante un envío, se abre otra y se
+    reintenta el mensaje una vez.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_key = (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+        self.entry = None
+
+    def open(self):
+        if self.connection:
+            return False
+        entry = _pool.acquire(self.pool_key)
+        if entry is not None:
+            self.connection = entry.connection
+            self.entry = entry
+            return True
+        opened = super().open()
+        if opened:
+            self.entry = PooledConnection(self.connection)
+        return opened
+
+    def close(self):
+        if self.connection is None:
+            return
+        entry, self.entry = self.entry, None
+        if entry is not None and _pool.release(self.pool_key, entry):
+            self.connection = None
+            return
+        super().close()
+
+    def reopen(self):
+        """Cierra la conexión actual (sin devolverla al pool) y abre una nueva."""
+        self.entry = None
+        super().close()
+        opened = super().open()
+        if opened:
+            self.entry = PooledConnection(self.connection)
+        return bool(self.connection)
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        with self._lock:
+            new_conn_created = self.open()
+            if not self.connection or new_conn_created is None:
+                return 0
+            num_sent = 0
+            try:
+                for message in email_messages:
+                    if self.entry is not None and self.entry.sent >= _setting('MAX_MESSAGES', 100):
+                        if not self.reopen():
+                            break
+                    if self.deliver(message):
+                        num_sent += 1
+            finally:
+                if new_conn_created:
+                    self.close()
+        return num_sent
+
+    def deliver(self, message):
+        """Envía un mensaje; si la conexión se cerró, reconecta y reintenta una vez."""
+        try:
+            sent = self._send(message)
+        except smtplib.SMTPServerDisconnected:
+            if not self.reopen():
+                raise
+            sent = self._send(message)
+        else:
+            # Con fail_silently el error no se propaga: se detecta por la conexión cerrada
+            if not sent and self.entry is not None and self.entry.is_closed() and self.reopen():
+                sent = self._send(message)
+        if sent and self.entry is not None:
+            self.entry.sent += 1
+        return sent
+
+
+def send_many(messages, connection=None, fail_silently=False):
+    """
+    Envía varios emails por una sola conexión SMTP (tomada del pool con
+    PooledEmailBackend), p. ej. las facturas emitidas en lote.
+
+    Returns:
+        int: Mensajes enviados.
+    """
+    connection = connection or get_connection(fail_silently=fail_silently)
+    return connection.send_messages(list(messages))
+
+
+def close_pooled_connections():
+    """Cierra las conexiones sin usar del pool (p. ej. al detener un worker)."""
+    _pool.clear()
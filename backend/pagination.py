@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class CountableCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset): el costo de cada página no depende de su
+    posición. El total de registros solo se calcula si se pide con
+    `?include_count=true`, porque requiere un COUNT sobre todo el queryset.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    count_query_param = 'include_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return response_schema
+
+
+class IdCursorPagination(CountableCursorPagination):
+    """Paginación por `id` para los catálogos (empresas, categorías, productos, clientes)."""
+    ordering = 'id'
+
+
+class CreatedAtCursorPagination(CountableCursorPagination):
+    """Paginación por (`created_at`, `id`), del más reciente al más antiguo."""
+    ordering = ('-created_at', '-id')
+
+
+class SearchResultsPagination(PageNumberPagination):
+    """
+    Paginación por número de página para resultados ordenados por relevancia,
+    que no se pueden recorrer con un cursor sobre una columna.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
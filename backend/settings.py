@@ -44,6 +44,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'marketplace.tenancy.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,7 +54,7 @@ ROOT_URLCONF = 'backend.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -71,11 +72,39 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 DATABASES = {
     'default': dj_database_url.config(
-        conn_max_age=600,
+        # En un despliegue ASGI (uvicorn) se usa 0: cada hilo del executor
+        # abriría su propia conexión persistente (ver backend/asgi.py)
+        conn_max_age=config('DB_CONN_MAX_AGE', default=600, cast=int),
         default='sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')
     )
 }
 
+# Cache
+# Por defecto en memoria del proceso. Para compartirlo entre workers:
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache  CACHE_LOCATION=/var/tmp/facturas_cache
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache          CACHE_LOCATION=redis://localhost:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='facturas'),
+        'TIMEOUT': 300,
+    }
+}
+
+# Empresas de cada usuario para los filtros por empresa (marketplace.tenancy).
+# TENANT_CACHE_TIMEOUT requiere un caché compartido (Redis): con LocMemCache
+# otro worker no ve las invalidaciones y se usa TENANT_LOCAL_CACHE_TIMEOUT
+TENANT_CACHE_ALIAS = 'default'
+TENANT_CACHE_TIMEOUT = 3600
+TENANT_LOCAL_CACHE_TIMEOUT = 5
+
+# Respuestas de lectura del catálogo (marketplace.cache). CATALOG_CACHE_TIMEOUT
+# requiere un caché compartido (Redis): con LocMemCache otro worker no ve las
+# invalidaciones y se usa CATALOG_LOCAL_CACHE_TIMEOUT
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+CATALOG_LOCAL_CACHE_TIMEOUT = 5
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -95,6 +124,8 @@ AUTH_PASSWORD_VALIDATORS = [
 # Internationalization
 LANGUAGE_CODE = 'es-es'
 TIME_ZONE = 'UTC'
+# Zona horaria para agrupar ventas por día/semana/mes (dashboard y resumen)
+REPORTING_TIME_ZONE = config('REPORTING_TIME_ZONE', default='America/Bogota')
 USE_I18N = True
 USE_TZ = True
 
@@ -138,21 +169,78 @@ CORS_PREFLIGHT_MAX_AGE = 86400
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'invoicing.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.IdCursorPagination',
+    'PAGE_SIZE': config('API_PAGE_SIZE', default=50, cast=int),
 }
+API_MAX_PAGE_SIZE = 200
+
+# Caché de autenticación por token (invoicing.authentication)
+AUTH_TOKEN_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'LOCAL_MAX_SIZE': 1024,
+    'LOCAL_TTL': 30,  # segundos que otro proceso puede tardar en ver una revocación
+    'SHARED_TTL': 300,  # solo con un caché compartido (Redis); con LocMemCache no se usa
+}
+# Tokens firmados sin estado ("s.<...>") devueltos por el login además del token normal
+AUTH_SIGNED_TOKENS = config('AUTH_SIGNED_TOKENS', default=False, cast=bool)
+AUTH_SIGNED_TOKEN_MAX_AGE = 900
 
 # Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# SMTP con conexiones reutilizadas entre envíos (backend.mail)
+EMAIL_BACKEND = 'backend.mail.PooledEmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'yo@cristianholguin.com'
 EMAIL_HOST_PASSWORD = 'Ceo@cloudming.c0'
 DEFAULT_FROM_EMAIL = 'yo@cristianholguin.com'
+# Una conexión reutilizada no debe bloquear el worker si el servidor no responde
+EMAIL_TIMEOUT = 30
+EMAIL_POOL = {
+    'MAX_SIZE': 4,  # conexiones sin usar que se conservan por proceso
+    'MAX_IDLE': 60,  # segundos sin uso tras los que se descarta una conexión
+    'CHECK_AFTER': 5,  # segundos sin uso tras los que se verifica con NOOP
+    'MAX_MESSAGES': 100,  # mensajes por conexión antes de abrir otra
+}
 ADMIN_EMAIL = 'carniceria@cristianholguin.com'
 
+# Invoice delivery jobs (python manage.py process_invoice_jobs)
+INVOICE_JOB_MAX_ATTEMPTS = 5
+INVOICE_JOB_BACKOFF_BASE = 30  # segundos, se duplica en cada reintento
+INVOICE_JOB_BACKOFF_MAX = 3600
+INVOICE_JOB_LOCK_TIMEOUT = 600
+INVOICE_JOBS_RUN_EAGERLY = config('INVOICE_JOBS_RUN_EAGERLY', default=False, cast=bool)
+
+# Invoice numbering: 1 = sin huecos (bloqueo de fila hasta el commit);
+# > 1 = cada worker reserva bloques de números (puede dejar huecos)
+INVOICE_SEQUENCE_BLOCK_SIZE = config('INVOICE_SEQUENCE_BLOCK_SIZE', default=1, cast=int)
+
+# Caché de PDFs de facturas, direccionado por hash del contenido.
+# BACKEND puede ser cualquier Storage de Django (p. ej. S3/Cloudinary).
+INVOICE_PDF_CACHE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {
+        'location': config('INVOICE_PDF_CACHE_DIR', default=os.path.join(BASE_DIR, 'pdf_cache')),
+    },
+}
+
+# Exportación masiva de PDFs (GET /api/invoicing/invoices/export_pdfs/)
+INVOICE_PDF_EXPORT_WORKERS = config('INVOICE_PDF_EXPORT_WORKERS', default=2, cast=int)  # 0 = sin pool
+INVOICE_PDF_EXPORT_BATCH_SIZE = 50
+
+# Bulk invoice import (POST /api/invoicing/invoices/bulk/)
+INVOICE_BULK_MAX_SIZE = 5000
+INVOICE_BULK_BATCH_SIZE = 500
+
+# Búsqueda de productos (?search=): máximo de resultados del índice en memoria (SQLite).
+# Con LocMemCache cada worker recarga su índice cada PRODUCT_SEARCH_LOCAL_TTL
+# segundos, porque no ve los cambios de los demás (ver marketplace.search)
+PRODUCT_SEARCH_MAX_RESULTS = 1000
+PRODUCT_SEARCH_LOCAL_TTL = 30
+
 # API Documentation Configuration
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Facturas PWA',
@@ -0,0 +1,89 @@
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Sesión SMTP mínima: acepta cualquier remitente y destinatario."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        if server.connect_delay:
+            # Simula el handshake TLS y la autenticación de un servidor real
+            time.sleep(server.connect_delay)
+        self.reply('220 localhost ESMTP')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode('utf-8', 'replace').strip()[:4].upper()
+            with server.lock:
+                server.commands.append(verb)
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif verb in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.receive()
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def receive(self):
+        lines = []
+        for line in self.rfile:
+            if line == b'.\r\n':
+                break
+            lines.append(line)
+        with self.server.lock:
+            self.server.messages.append(b''.join(lines))
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP local en memoria para pruebas y benchmarks: guarda los
+    mensajes recibidos en `messages` (y los comandos en `commands`) y no
+    entrega nada.
+
+    Sin TLS ni autenticación; `connect_delay` añade una espera por conexión
+    para reproducir el costo de abrir una conexión con el servidor real.
+
+        server = LocalSMTPServer(connect_delay=0.2).start()
+        ...  # EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port, EMAIL_USE_TLS=False
+        server.stop()
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, connect_delay=0.0):
+        super().__init__((host, port), _SMTPHandler)
+        self.connect_delay = connect_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.commands = []
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.db.models import Sum
-from .models import CustomerUser, Invoice, InvoiceItem
+from django.utils import timezone
+from .models import CustomerUser, Invoice, InvoiceItem, InvoiceJob
 
 
 from django.contrib.auth.admin import UserAdmin
@@ -142,4 +143,19 @@ class InvoiceItemAdmin(admin.ModelAdmin):
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "invoice" and not request.user.is_superuser:
             kwargs["queryset"] = Invoice.objects.filter(company__user=request.user)
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
\ No newline at end of file
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+@admin.register(InvoiceJob)
+class InvoiceJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'invoice', 'job_type', 'status', 'attempts', 'run_at', 'locked_by', 'updated_at')
+    list_filter = ('status', 'job_type')
+    search_fields = ('invoice__invoice_number', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'locked_by', 'last_error')
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status='COMPLETADO').update(
+            status='PENDIENTE', attempts=0, run_at=timezone.now(), locked_at=None, locked_by=''
+        )
+        self.message_user(request, f"{updated} trabajos reprogramados")
+    retry_jobs.short_description = "Reintentar trabajos seleccionados"
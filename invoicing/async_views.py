@@ -0,0 +1,148 @@
+"""
+Versiones asíncronas de los endpoints de solo lectura con más espera de E/S:
+dashboard, descarga del PDF y búsqueda de clientes.
+
+Usan el ORM asíncrono de Django y solo aprovechan la concurrencia bajo ASGI
+(ver backend/asgi.py); bajo WSGI, el despliegue por defecto, funcionan igual
+que las vistas síncronas. DRF no soporta vistas asíncronas, por eso son
+vistas de Django que autentican por token con la misma clase que la API y
+responden con el mismo JSON que sus equivalentes en InvoiceViewSet y
+CustomerUserViewSet.
+"""
+import functools
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+
+from marketplace.tenancy import aget_company_ids, aowns_company
+
+from .authentication import CachedTokenAuthentication
+from .dashboard import adashboard_data, parse_sections
+from .lookup import alookup_customers
+from .models import Invoice, InvoiceItem
+from .pdf_cache import get_invoice_pdf, invoice_pdf_hash
+from .serializers import CustomerLookupSerializer, CustomerUserSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def _json(data, status=200):
+    # Mismo codificador que DRF (Decimal como número, fechas ISO 8601)
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def token_required(view):
+    """Autentica la petición con CachedTokenAuthentication y asigna `request.user`."""
+    authentication = CachedTokenAuthentication()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            # Con el token en caché no consulta la base de datos
+            result = await sync_to_async(authentication.authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            return _json({'detail': e.detail}, status=401)
+        if result is None:
+            return _json({'detail': exceptions.NotAuthenticated.default_detail}, status=401)
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@require_GET
+@token_required
+async def dashboard(request):
+    """Dashboard completo para la empresa (ver InvoiceViewSet.dashboard)"""
+    company_id = request.GET.get('company_id')
+    if not company_id:
+        return _json({"error": "Se requiere company_id"}, status=400)
+    if not await aowns_company(request, company_id):
+        return _json({"error": "Empresa no encontrada"}, status=404)
+    try:
+        sections = parse_sections(request.GET.get('sections'))
+    except ValueError as e:
+        return _json({"error": str(e)}, status=400)
+
+    try:
+        return _json(await adashboard_data(company_id, sections))
+    except Exception as e:
+        logger.error(f"Error getting dashboard data: {str(e)}")
+        return _json({"error": "Error al obtener datos del dashboard"}, status=500)
+
+
+@require_GET
+@token_required
+async def generate_pdf(request, pk):
+    """Descarga el PDF de la factura (ver InvoiceViewSet.generate_pdf)"""
+    try:
+        invoice = await Invoice.objects.filter(
+            company_id__in=await aget_company_ids(request)
+        ).select_related('customer').prefetch_related(
+            Prefetch('invoice_items', queryset=InvoiceItem.objects.order_by('id'))
+        ).aget(pk=pk)
+    except Invoice.DoesNotExist:
+        return _json({'detail': exceptions.NotFound.default_detail}, status=404)
+
+    try:
+        content_hash = invoice_pdf_hash(invoice)
+        etag = f'"{content_hash}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        # Lectura del caché y renderizado fuera del event loop; con las
+        # relaciones ya cargadas no accede a la base de datos, así que puede
+        # correr en paralelo con otras peticiones (thread_sensitive=False)
+        pdf = await sync_to_async(get_invoice_pdf, thread_sensitive=False)(invoice, content_hash)
+
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    except Exception as e:
+        logger.error(f"Error generating PDF: {str(e)}")
+        return _json({"error": "Error al generar el PDF"}, status=500)
+
+
+@csrf_exempt
+@require_POST
+@token_required
+async def customer_lookup(request):
+    """Búsqueda de clientes (ver CustomerUserViewSet.lookup)"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = request.POST
+    serializer = CustomerLookupSerializer(data=data)
+    if not serializer.is_valid():
+        return _json(serializer.errors, status=400)
+
+    # Solo se buscan clientes de las empresas del usuario
+    company_ids = await aget_company_ids(request)
+    company_id = serializer.validated_data.get('company_id')
+    if company_id is not None:
+        company_ids = [company_id] if await aowns_company(request, company_id) else []
+    if company_id is not None and not company_ids:
+        return _json({"error": "Empresa no encontrada"}, status=404)
+
+    try:
+        customers = await alookup_customers(
+            serializer.validated_data['search_term'],
+            company_ids,
+            limit=serializer.validated_data['limit']
+        )
+        return _json(CustomerUserSerializer(customers, many=True).data)
+    except Exception as e:
+        logger.error(f"Error in customer lookup: {str(e)}")
+        return _json({"error": "Error en la búsqueda de clientes"}, status=500)
@@ -0,0 +1,224 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from backend.cache import is_process_local
+
+SIGNED_TOKEN_PREFIX = 's.'
+SIGNED_TOKEN_SALT = 'invoicing.authentication.signed-token'
+
+# Campos del usuario que se cachean: los que usan los permisos (IsAuthenticated,
+# is_staff/is_superuser) y los filtros por empresa (pk, ver marketplace.tenancy)
+USER_FIELDS = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def _setting(name, default):
+    return getattr(settings, 'AUTH_TOKEN_CACHE', {}).get(name, default)
+
+
+class LocalCache:
+    """LRU en memoria del proceso con expiración por entrada."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = LocalCache(
+    max_size=_setting('LOCAL_MAX_SIZE', 1024),
+    ttl=_setting('LOCAL_TTL', 30)
+)
+
+
+def _shared():
+    """
+    Nivel compartido entre workers, o None si el caché es por proceso
+    (LocMemCache): ahí la invalidación no llegaría a los demás workers, que
+    seguirían aceptando un token eliminado durante SHARED_TTL.
+    """
+    cache = caches[_setting('CACHE_ALIAS', 'default')]
+    return None if is_process_local(cache) else cache
+
+
+def _token_cache_key(key):
+    # Se guarda el hash: el token no aparece en claro en el caché compartido
+    return f"auth:v2:token:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+
+def _user_cache_key(user_id):
+    return f"auth:v2:user:{user_id}"
+
+
+def _user_values(user):
+    # Solo USER_FIELDS: ni el hash de la contraseña ni instancias compartidas entre hilos
+    return tuple(getattr(user, field) for field in USER_FIELDS)
+
+
+def _entry(token, user):
+    return (token.key, _user_values(user))
+
+
+def _build_user(values):
+    """
+    Usuario nuevo (uno por petición) a partir de los campos cacheados. El
+    resto de campos quedan diferidos: si una vista los usa, se cargan de la
+    base de datos en lugar de quedar vacíos.
+    """
+    user_model = get_user_model()
+    fields = dict(zip(USER_FIELDS, values))
+    if not fields['is_active']:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    # from_db recibe los valores en el orden de los campos del modelo
+    names = [field.attname for field in user_model._meta.concrete_fields if field.attname in fields]
+    return user_model.from_db(router.db_for_read(user_model), names, [fields[name] for name in names])
+
+
+def _cached(cache_key):
+    """Entrada del LRU local o, si no está, del caché compartido (y la copia al local)."""
+    entry = _local.get(cache_key)
+    if entry is None:
+        shared = _shared()
+        entry = shared.get(cache_key) if shared is not None else None
+        if entry is not None:
+            _local.set(cache_key, entry)
+    return entry
+
+
+def _remember(cache_key, entry):
+    _local.set(cache_key, entry)
+    shared = _shared()
+    if shared is not None:
+        shared.set(cache_key, entry, timeout=_setting('SHARED_TTL', 300))
+
+
+def remember_token(token):
+    """Guarda en ambos niveles de caché el token con su usuario (p. ej. al iniciar sesión)."""
+    _remember(_token_cache_key(token.key), _entry(token, token.user))
+
+
+def forget_token(key):
+    cache_key = _token_cache_key(key)
+    _local.delete(cache_key)
+    shared = _shared()
+    if shared is not None:
+        shared.delete(cache_key)
+
+
+def forget_user(user_id):
+    """
+    Invalida el usuario y los tokens cacheados de un usuario (desactivación,
+    cambio de datos). Los LRU de otros procesos los conservan como máximo
+    LOCAL_TTL segundos.
+    """
+    cache_key = _user_cache_key(user_id)
+    _local.delete(cache_key)
+    shared = _shared()
+    if shared is not None:
+        shared.delete(cache_key)
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        forget_token(key)
+
+
+def make_signed_token(user):
+    """Token firmado sin estado: identifica al usuario sin consultar la tabla de tokens."""
+    return SIGNED_TOKEN_PREFIX + signing.dumps({'u': user.pk}, salt=SIGNED_TOKEN_SALT, compress=True)
+
+
+def _load_user(user_id):
+    """Usuario de un token firmado, desde el caché o con una consulta por clave primaria."""
+    cache_key = _user_cache_key(user_id)
+    values = _cached(cache_key)
+    if values is None:
+        user = get_user_model().objects.filter(pk=user_id).only(*USER_FIELDS).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        values = _user_values(user)
+        _remember(cache_key, values)
+    return _build_user(values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication que cachea la resolución del token en dos niveles: un
+    LRU en memoria del proceso (LOCAL_TTL segundos) y el caché compartido de
+    Django (SHARED_TTL, solo si es compartido entre workers, p. ej. Redis).
+
+    Se cachea el token con los campos del usuario de USER_FIELDS (id,
+    is_active, is_staff, is_superuser), de los que se reconstruye el usuario
+    en cada petición: un token en caché no consulta la base de datos. Los
+    demás campos del usuario se cargan solo si una vista los usa.
+
+    Borrar el token o guardar el usuario (p. ej. desactivarlo) invalida las
+    entradas (ver invoicing.signals); en otros procesos el LRU local las
+    conserva como máximo LOCAL_TTL segundos.
+
+    Con AUTH_SIGNED_TOKENS también acepta tokens firmados ("s.<...>", ver
+    `make_signed_token`), válidos AUTH_SIGNED_TOKEN_MAX_AGE segundos. No se
+    pueden revocar antes de expirar salvo desactivando al usuario.
+    """
+
+    def authenticate_credentials(self, key):
+        if key.startswith(SIGNED_TOKEN_PREFIX) and getattr(settings, 'AUTH_SIGNED_TOKENS', False):
+            return self.authenticate_signed(key[len(SIGNED_TOKEN_PREFIX):])
+
+        cache_key = _token_cache_key(key)
+        entry = _cached(cache_key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            _remember(cache_key, _entry(token, user))
+            return user, Token(key=token.key, user_id=token.user_id)
+
+        token_key, values = entry
+        user = _build_user(values)
+        return user, Token(key=token_key, user_id=user.pk)
+
+    def authenticate_signed(self, value):
+        try:
+            payload = signing.loads(
+                value,
+                salt=SIGNED_TOKEN_SALT,
+                max_age=getattr(settings, 'AUTH_SIGNED_TOKEN_MAX_AGE', 900)
+            )
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return _load_user(payload['u']), None
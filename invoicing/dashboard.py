@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from marketplace.models import Company
+
+from .models import DailyCompanySales, Invoice
+from .rollups import reporting_today
+
+# Secciones que se resuelven en la consulta de estadísticas, con sus campos
+STAT_SECTIONS = {
+    'totals': ('total_invoices', 'total_amount'),
+    'monthly': ('monthly_invoices', 'monthly_amount'),
+    'upcoming_due': ('upcoming_due',),
+    'overdue': ('overdue',),
+}
+# Secciones que son listados (una consulta cada una)
+LIST_SECTIONS = ('top_customers', 'recent_activity')
+SECTIONS = (*STAT_SECTIONS, *LIST_SECTIONS)
+
+
+def parse_sections(value):
+    """
+    Secciones pedidas con `?sections=totals,overdue` (todas si no se indica).
+
+    Raises:
+        ValueError: Si alguna sección no existe.
+    """
+    if not value:
+        return set(SECTIONS)
+    sections = {section.strip() for section in value.split(',') if section.strip()}
+    unknown = sections - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Sección no válida: {', '.join(sorted(unknown))}")
+    return sections
+
+
+def _scalar(queryset, expression):
+    """Subconsulta con un agregado sobre las filas de `queryset` de la empresa externa."""
+    return Subquery(
+        queryset.filter(company_id=OuterRef('pk')).values('company_id').annotate(
+            value=expression
+        ).values('value')[:1]
+    )
+
+
+def _stat_expressions(sections):
+    """
+    Expresiones de las estadísticas pedidas, cada una una subconsulta escalar
+    acotada a la empresa: totales y mes en curso desde el acumulado diario
+    (DailyCompanySales) y facturas por vencer y vencidas sobre el índice
+    (company, status, due_date).
+    """
+    now = timezone.now()
+    month = Q(date__gte=reporting_today().replace(day=1))
+    upcoming = Q(due_date__gte=now, due_date__lte=now + timedelta(days=7))
+    overdue = Q(due_date__lt=now)
+
+    daily_sales = DailyCompanySales.objects.all()
+    issued = Invoice.objects.filter(status='EMITIDA')
+    expressions = {}
+    if 'totals' in sections:
+        expressions['total_invoices'] = _scalar(daily_sales, Sum('invoice_count'))
+        expressions['total_amount'] = _scalar(daily_sales, Sum('amount'))
+    if 'monthly' in sections:
+        month_sales = daily_sales.filter(month)
+        expressions['monthly_invoices'] = _scalar(month_sales, Sum('invoice_count'))
+        expressions['monthly_amount'] = _scalar(month_sales, Sum('amount'))
+    if 'upcoming_due' in sections:
+        expressions['upcoming_due'] = _scalar(issued.filter(upcoming), Count('pk'))
+    if 'overdue' in sections:
+        expressions['overdue'] = _scalar(issued.filter(overdue), Count('pk'))
+    return expressions
+
+
+def _queries(company_id, sections):
+    """
+    Consultas del dashboard, sin evaluar: las estadísticas en una sola fila
+    (una consulta para todas) y una por cada listado pedido.
+
+    Las comparten `dashboard_data` y `adashboard_data` para que las versiones
+    síncrona y asíncrona devuelvan lo mismo.
+    """
+    queries = {}
+    expressions = _stat_expressions(sections)
+    if expressions:
+        queries['stats'] = Company.objects.filter(pk=company_id).values(**expressions)
+
+    invoices = Invoice.objects.filter(company_id=company_id)
+    if 'top_customers' in sections:
+        queries['top_customers'] = invoices.values(
+            'customer__first_name', 'customer__last_name'
+        ).annotate(
+            total_invoices=Count('id'),
+            total_amount=Sum('total')
+        ).order_by('-total_amount')[:5]
+    if 'recent_activity' in sections:
+        queries['recent_activity'] = invoices.order_by('-updated_at')[:10].values(
+            'id', 'invoice_number', 'customer__first_name',
+            'customer__last_name', 'total', 'status', 'updated_at'
+        )
+    return queries
+
+
+def _response(results, sections):
+    stats = results.pop('stats', None)
+    row = stats[0] if stats else {}
+    data = {
+        field: row.get(field) or 0
+        for section, fields in STAT_SECTIONS.items() if section in sections
+        for field in fields
+    }
+    data.update(results)
+    return data
+
+
+def dashboard_data(company_id, sections=SECTIONS):
+    """Datos del dashboard de la empresa en 1 a 3 consultas (ver InvoiceViewSet.dashboard)."""
+    queries = _queries(company_id, sections)
+    return _response({name: list(queryset) for name, queryset in queries.items()}, sections)
+
+
+async def adashboard_data(company_id, sections=SECTIONS):
+    """Versión asíncrona de `dashboard_data`, con el ORM asíncrono."""
+    queries = _queries(company_id, sections)
+    return _response({name: [row async for row in queryset] for name, queryset in queries.items()}, sections)
@@ -0,0 +1,84 @@
+import csv
+
+from django.conf import settings
+
+from .models import InvoiceItem
+
+# (encabezado, campo para values_list)
+INVOICE_COLUMNS = [
+    ('id', 'id'),
+    ('numero', 'invoice_number'),
+    ('id_interno', 'internal_id'),
+    ('empresa', 'company__name'),
+    ('cliente_email', 'customer__email'),
+    ('cliente_nombre', 'customer__first_name'),
+    ('cliente_apellido', 'customer__last_name'),
+    ('cliente_identificacion', 'customer__identification_number'),
+    ('estado', 'status'),
+    ('fecha_emision', 'issue_date'),
+    ('fecha_vencimiento', 'due_date'),
+    ('subtotal', 'subtotal'),
+    ('total', 'total'),
+    ('creada', 'created_at'),
+]
+
+ITEM_COLUMNS = [
+    ('factura_id', 'invoice_id'),
+    ('factura_numero', 'invoice__invoice_number'),
+    ('fecha_emision', 'invoice__issue_date'),
+    ('estado', 'invoice__status'),
+    ('cliente_email', 'invoice__customer__email'),
+    ('producto_id', 'product_id'),
+    ('producto', 'product_name'),
+    ('cantidad', 'quantity'),
+    ('precio_unitario', 'unit_price'),
+    ('total', 'total'),
+    ('descripcion', 'description'),
+]
+
+
+# Caracteres con los que Excel interpreta una celda como fórmula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_cell(value):
+    """
+    Antepone un apóstrofo a los textos que empiezan como una fórmula (p. ej.
+    un nombre "=HYPERLINK(...)"), para que Excel los muestre como texto. Los
+    números y fechas se escriben tal cual.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Echo:
+    """Objeto tipo archivo que devuelve lo escrito, para usar csv.writer en streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _stream_rows(queryset, columns):
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    writer = csv.writer(_Echo())
+
+    # BOM para que Excel detecte UTF-8 (tildes y eñes)
+    yield '\ufeff' + writer.writerow([header for header, _ in columns])
+
+    rows = queryset.values_list(*[field for _, field in columns])
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield writer.writerow([escape_cell(value) for value in row])
+
+
+def stream_invoices_csv(invoices):
+    """Filas CSV de las facturas, leídas por bloques con una proyección de columnas."""
+    return _stream_rows(invoices.order_by('-created_at', '-id'), INVOICE_COLUMNS)
+
+
+def stream_invoice_items_csv(invoices):
+    """Filas CSV de los ítems de las facturas indicadas."""
+    items = InvoiceItem.objects.filter(
+        invoice_id__in=invoices.order_by().values('id')
+    ).order_by('invoice_id', 'id')
+    return _stream_rows(items, ITEM_COLUMNS)
@@ -0,0 +1,161 @@
+import logging
+import os
+import random
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Invoice, InvoiceJob
+
+logger = logging.getLogger(__name__)
+
+
+def _send_email(job):
+    """Renderiza el PDF y envía el email de la factura."""
+    invoice = Invoice.objects.select_related('customer').get(pk=job.invoice_id)
+    invoice.send_invoice_email()
+
+
+JOB_HANDLERS = {
+    'SEND_EMAIL': _send_email,
+}
+
+
+def default_worker_id():
+    """Identificador del worker: host y PID del proceso."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_invoice_email(invoice):
+    """
+    Encola el envío de la factura por email.
+
+    El trabajo se inserta dentro de la transacción actual (patrón outbox), de
+    modo que solo es visible para los workers cuando la factura se confirma, y
+    se descarta si la transacción se revierte.
+
+    Args:
+        invoice (Invoice): Factura a enviar.
+
+    Returns:
+        InvoiceJob: Trabajo creado.
+    """
+    job = InvoiceJob.objects.create(
+        invoice=invoice,
+        job_type='SEND_EMAIL',
+        max_attempts=getattr(settings, 'INVOICE_JOB_MAX_ATTEMPTS', 5)
+    )
+
+    # En desarrollo se puede procesar en el mismo proceso al confirmar
+    if getattr(settings, 'INVOICE_JOBS_RUN_EAGERLY', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+
+    return job
+
+
+def get_backoff(attempts):
+    """Calcula el retraso exponencial (con jitter) para el siguiente intento."""
+    base = getattr(settings, 'INVOICE_JOB_BACKOFF_BASE', 30)
+    cap = getattr(settings, 'INVOICE_JOB_BACKOFF_MAX', 3600)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_jobs(worker_id, batch_size=10):
+    """
+    Reserva un lote de trabajos listos para ejecutarse.
+
+    Se usa `SELECT ... FOR UPDATE SKIP LOCKED` donde la base de datos lo
+    soporta; además cada trabajo se reclama con un UPDATE condicional, por lo
+    que dos workers nunca procesan el mismo trabajo (también en SQLite).
+    Los trabajos bloqueados por un worker caído se liberan tras
+    `INVOICE_JOB_LOCK_TIMEOUT` segundos.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'INVOICE_JOB_LOCK_TIMEOUT', 600))
+
+    with transaction.atomic():
+        InvoiceJob.objects.filter(
+            status='EN_PROCESO',
+            locked_at__lt=stale
+        ).update(status='PENDIENTE', locked_at=None, locked_by='')
+
+        candidates = list(
+            InvoiceJob.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDIENTE', run_at__lte=now)
+            .order_by('run_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+
+        claimed = []
+        for job_id in candidates:
+            updated = InvoiceJob.objects.filter(
+                pk=job_id,
+                status='PENDIENTE'
+            ).update(status='EN_PROCESO', locked_at=now, locked_by=worker_id, updated_at=now)
+            if updated:
+                claimed.append(job_id)
+
+    return list(InvoiceJob.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def execute_job(job):
+    """Ejecuta un trabajo reclamado y registra el resultado o el reintento."""
+    handler = JOB_HANDLERS.get(job.job_type)
+    job.attempts += 1
+
+    try:
+        if handler is None:
+            raise ValueError(f"Tipo de trabajo desconocido: {job.job_type}")
+        handler(job)
+    except Exception as e:
+        logger.error(f"Error processing job {job.pk} ({job.job_type}): {str(e)}")
+        job.last_error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = 'FALLIDO'
+        else:
+            job.status = 'PENDIENTE'
+            job.run_at = timezone.now() + get_backoff(job.attempts)
+    else:
+        job.status = 'COMPLETADO'
+        job.last_error = ''
+
+    job.locked_at = None
+    job.locked_by = ''
+    job.save(update_fields=[
+        'attempts', 'status', 'run_at', 'last_error',
+        'locked_at', 'locked_by', 'updated_at'
+    ])
+    return job.status == 'COMPLETADO'
+
+
+def run_job(job_id, worker_id=None):
+    """Reclama y ejecuta un trabajo concreto (modo eager)."""
+    updated = InvoiceJob.objects.filter(
+        pk=job_id,
+        status='PENDIENTE'
+    ).update(
+        status='EN_PROCESO',
+        locked_at=timezone.now(),
+        locked_by=worker_id or default_worker_id()
+    )
+    if not updated:
+        return False
+    return execute_job(InvoiceJob.objects.get(pk=job_id))
+
+
+def process_jobs(worker_id=None, batch_size=10):
+    """
+    Procesa un lote de trabajos pendientes.
+
+    Returns:
+        int: Número de trabajos procesados (exitosos o no).
+    """
+    worker_id = worker_id or default_worker_id()
+    jobs = claim_jobs(worker_id, batch_size=batch_size)
+    for job in jobs:
+        execute_job(job)
+    return len(jobs)
@@ -0,0 +1,157 @@
+import re
+
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+
+from marketplace.search import tokenize
+
+from .models import CustomerUser, Invoice
+
+NON_ALPHANUMERIC_RE = re.compile(r'[^0-9A-Za-z]')
+NON_DIGIT_RE = re.compile(r'\D')
+
+# Términos de búsqueda más cortos no usan los índices de prefijo
+MIN_PREFIX_LENGTH = 2
+MAX_RESULTS = 20
+
+
+def normalize_name(*parts):
+    """'José  Pérez' -> 'jose perez' (minúsculas, sin tildes ni signos)."""
+    return ' '.join(token for part in parts for token in tokenize(part))
+
+
+def normalize_identification(value):
+    """'1.020.345-6' -> '10203456'; conserva letras de pasaportes y NIT en mayúscula."""
+    return NON_ALPHANUMERIC_RE.sub('', value or '').upper()
+
+
+def normalize_phone(value):
+    return NON_DIGIT_RE.sub('', value or '')
+
+
+def normalize_email(value):
+    # Todo en minúsculas: el email se guarda con la parte local tal como se escribió
+    return (value or '').strip().lower()
+
+
+def lookup_fields(customer):
+    """Valores normalizados que se indexan para la búsqueda del cliente."""
+    return {
+        'lookup_name': normalize_name(customer.first_name, customer.last_name)[:301],
+        'lookup_name_reversed': normalize_name(customer.last_name, customer.first_name)[:301],
+        'lookup_identification': normalize_identification(customer.identification_number)[:20],
+        'lookup_phone': normalize_phone(customer.phone_number)[:15],
+        'lookup_email': normalize_email(customer.email)[:254],
+    }
+
+
+def _is_postgresql():
+    return connections[CustomerUser.objects.db].vendor == 'postgresql'
+
+
+def _prefix(field, value):
+    """
+    Coincidencia por prefijo que usa el índice B-tree del campo.
+
+    En PostgreSQL, LIKE 'valor%' con los índices varchar_pattern_ops; en SQLite
+    (cuyo LIKE no distingue mayúsculas y no usa índices), un rango equivalente.
+    """
+    if _is_postgresql():
+        return Q(**{f'{field}__startswith': value})
+    return Q(**{f'{field}__gte': value, f'{field}__lt': value + '\uffff'})
+
+
+def customers_of(company_ids):
+    """Filtro de clientes con alguna factura en las empresas indicadas (índice customer/created_at)."""
+    return Exists(Invoice.objects.filter(customer=OuterRef('pk'), company_id__in=company_ids))
+
+
+def _lookup_stages(term, company_ids):
+    """Consultas (queryset, orden) de cada etapa de `lookup_customers`, en orden."""
+    term = (term or '').strip()
+    name = normalize_name(term)
+    identification = normalize_identification(term)
+    phone = normalize_phone(term)
+    email = normalize_email(term)
+
+    exact = Q()
+    if identification:
+        exact |= Q(lookup_identification=identification)
+    if phone:
+        exact |= Q(lookup_phone=phone)
+    if '@' in email:
+        exact |= Q(lookup_email=email)
+    if exact:
+        yield CustomerUser.objects.filter(exact), 'pk'
+
+    scoped = CustomerUser.objects.filter(customers_of(company_ids))
+    if len(identification) >= MIN_PREFIX_LENGTH:
+        yield scoped.filter(_prefix('lookup_identification', identification)), 'lookup_identification'
+    if len(phone) >= MIN_PREFIX_LENGTH:
+        yield scoped.filter(_prefix('lookup_phone', phone)), 'lookup_phone'
+    if len(email) >= MIN_PREFIX_LENGTH and not email.isdigit():
+        yield scoped.filter(_prefix('lookup_email', email)), 'lookup_email'
+
+    if len(name) >= MIN_PREFIX_LENGTH:
+        yield scoped.filter(_prefix('lookup_name', name)), 'lookup_name'
+        yield scoped.filter(_prefix('lookup_name_reversed', name)), 'lookup_name_reversed'
+
+        # Varias palabras en otro orden ("perez jose" para "José Pérez Gómez"):
+        # prefijo indexado con la primera y las demás filtradas sobre esas filas
+        first, *others = name.split()
+        if others:
+            words = [Q(lookup_name__contains=word) for word in others]
+            yield scoped.filter(_prefix('lookup_name', first), *words), 'lookup_name'
+            yield scoped.filter(_prefix('lookup_name_reversed', first), *words), 'lookup_name_reversed'
+        if _is_postgresql():
+            from django.contrib.postgres.search import TrigramSimilarity
+
+            yield scoped.filter(lookup_name__contains=name).annotate(
+                similarity=TrigramSimilarity('lookup_name', name)
+            ), '-similarity'
+
+
+def _remaining(queryset, order_by, results, limit):
+    """Consulta de una etapa sin los clientes ya encontrados, hasta completar `limit`."""
+    return queryset.exclude(pk__in=list(results)).order_by(order_by)[:limit - len(results)]
+
+
+def lookup_customers(term, company_ids, limit=5):
+    """
+    Clientes que coinciden con `term`, para autocompletar, en orden de relevancia:
+
+    1. Coincidencia exacta de identificación, teléfono o email, entre todos los
+       clientes (para facturar a un cliente registrado que aún no ha comprado
+       en la empresa).
+    2. Prefijo de identificación, teléfono o email.
+    3. Prefijo del nombre, por nombre o por apellido ("perez j"), o sus
+       palabras en cualquier orden.
+    4. Solo en PostgreSQL: el término en cualquier parte del nombre (índice de
+       trigramas).
+
+    Las etapas 2 a 4 se limitan a los clientes de `company_ids`. Cada etapa es
+    una consulta acotada sobre un índice y se detiene al completar `limit`.
+
+    Returns:
+        list[CustomerUser]
+    """
+    limit = min(limit, MAX_RESULTS)
+    results = {}
+    for queryset, order_by in _lookup_stages(term, company_ids):
+        if len(results) >= limit:
+            break
+        for customer in _remaining(queryset, order_by, results, limit):
+            results[customer.pk] = customer
+    return list(results.values())
+
+
+async def alookup_customers(term, company_ids, limit=5):
+    """Versión asíncrona de `lookup_customers`, con el ORM asíncrono."""
+    limit = min(limit, MAX_RESULTS)
+    results = {}
+    for queryset, order_by in _lookup_stages(term, company_ids):
+        if len(results) >= limit:
+            break
+        async for customer in _remaining(queryset, order_by, results, limit):
+            results[customer.pk] = customer
+    return list(results.values())
@@ -0,0 +1,130 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from invoicing.lookup import lookup_customers, lookup_fields
+from invoicing.models import CustomerUser, Invoice
+from marketplace.models import Company
+
+FIRST_NAMES = [
+    'Juan', 'José', 'María', 'Ana', 'Luis', 'Carlos', 'Andrés', 'Camila', 'Valentina',
+    'Sofía', 'Diego', 'Jorge', 'Laura', 'Daniela', 'Sebastián', 'Natalia', 'Julián',
+]
+LAST_NAMES = [
+    'Pérez', 'Gómez', 'Rodríguez', 'Martínez', 'García', 'López', 'Hernández', 'Díaz',
+    'Muñoz', 'Rojas', 'Moreno', 'Jiménez', 'Torres', 'Ramírez', 'Vargas', 'Castro',
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la búsqueda de clientes (lookup) frente a la consulta con icontains '
+        'sobre clientes sintéticos (se descartan al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int, required=True)
+        parser.add_argument('--customers', type=int, default=500000)
+        parser.add_argument('--queries', type=int, default=200)
+        # Uno de cada N clientes tiene facturas en la empresa
+        parser.add_argument('--company-share', type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company_id'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company_id']} does not exist")
+
+        try:
+            with transaction.atomic():
+                customers = self.create_customers(company, options['customers'], options['company_share'])
+                self.run(company, customers, options['queries'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def create_customers(self, company, count, company_share):
+        rng = random.Random(0)
+        start = time.perf_counter()
+        created = []
+        batch = []
+        for index in range(count):
+            customer = CustomerUser(
+                email=f"bench{index}@example.com",
+                username=f"bench{index}",
+                password='!',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+                identification_type='CC',
+                identification_number=str(rng.randrange(10 ** 7, 10 ** 10)),
+                phone_number=f"3{rng.randrange(10 ** 8, 10 ** 9)}",
+            )
+            for field, value in lookup_fields(customer).items():
+                setattr(customer, field, value)
+            batch.append(customer)
+            if len(batch) == 5000:
+                created.extend(CustomerUser.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            created.extend(CustomerUser.objects.bulk_create(batch))
+
+        Invoice.objects.bulk_create(
+            [
+                Invoice(company=company, customer=customer, invoice_number=f"BENCH-{customer.pk}")
+                for customer in created[::company_share]
+            ],
+            batch_size=5000
+        )
+        self.stdout.write(f"{count} clientes creados en {time.perf_counter() - start:.1f} s")
+        return created[::company_share]
+
+    def sample_terms(self, customers, count):
+        rng = random.Random(1)
+        terms = []
+        for _ in range(count):
+            customer = rng.choice(customers)
+            terms.append(rng.choice([
+                customer.first_name[:3],
+                customer.last_name[:4],
+                f"{customer.first_name} {customer.last_name[:2]}",
+                customer.identification_number[:5],
+                customer.identification_number,
+                customer.phone_number,
+            ]))
+        return terms
+
+    def percentiles(self, timings):
+        timings = sorted(timings)
+        return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+    def run(self, company, customers, queries):
+        terms = self.sample_terms(customers, queries)
+
+        indexed = []
+        for term in terms:
+            start = time.perf_counter()
+            lookup_customers(term, [company.pk])
+            indexed.append(time.perf_counter() - start)
+
+        icontains = []
+        for term in terms[:max(queries // 10, 1)]:
+            start = time.perf_counter()
+            list(CustomerUser.objects.filter(
+                Q(email__icontains=term) |
+                Q(identification_number__icontains=term) |
+                Q(phone_number__icontains=term) |
+                Q(first_name__icontains=term) |
+                Q(last_name__icontains=term)
+            )[:5])
+            icontains.append(time.perf_counter() - start)
+
+        for label, timings in (('lookup', indexed), ('icontains', icontains)):
+            p50, p95 = self.percentiles(timings)
+            self.stdout.write(f"{label:>10}: p50 {p50:7.1f} ms, p95 {p95:7.1f} ms ({len(timings)} búsquedas)")
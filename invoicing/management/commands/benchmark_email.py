@@ -0,0 +1,78 @@
+import time
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+
+from backend.mail import close_pooled_connections, send_many
+from backend.smtp_server import LocalSMTPServer
+from invoicing.pdf import render_invoice_pdf
+
+from .benchmark_invoice_pdf import sample_invoice_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el envío de emails de facturas con una conexión SMTP por email, '
+        'con conexiones reutilizadas (PooledEmailBackend) y en lote (send_many), '
+        'contra un servidor SMTP local'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=200)
+        parser.add_argument('--connect-delay', type=float, default=0.1,
+                            help='Segundos por conexión en el servidor local (TLS y autenticación)')
+
+    def handle(self, *args, **options):
+        pdf = render_invoice_pdf(sample_invoice_data(10))
+        server = LocalSMTPServer(connect_delay=options['connect_delay']).start()
+        connection_options = {
+            'host': '127.0.0.1',
+            'port': server.port,
+            'username': '',
+            'password': '',
+            'use_tls': False,
+            'use_ssl': False,
+        }
+
+        def messages():
+            for index in range(options['emails']):
+                msg = EmailMultiAlternatives(
+                    f'Factura #{index}',
+                    'Su factura está adjunta',
+                    'facturas@example.com',
+                    ['cliente@example.com']
+                )
+                msg.attach_alternative('<p>Factura</p>', 'text/html')
+                msg.attach(f'invoice_{index}.pdf', pdf, 'application/pdf')
+                yield msg
+
+        def one_by_one(backend):
+            for msg in messages():
+                msg.connection = get_connection(backend, **connection_options)
+                msg.send()
+
+        def batch():
+            send_many(messages(), connection=get_connection('backend.mail.PooledEmailBackend', **connection_options))
+
+        modes = [
+            ('Una conexión por email', lambda: one_by_one('django.core.mail.backends.smtp.EmailBackend')),
+            ('Conexiones reutilizadas', lambda: one_by_one('backend.mail.PooledEmailBackend')),
+            ('En lote (send_many)', batch),
+        ]
+        try:
+            for label, run in modes:
+                close_pooled_connections()
+                server.messages.clear()
+                server.connections = 0
+
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{label:<26} {len(server.messages) / elapsed:8.1f} emails/s, "
+                    f"{server.connections} conexiones, {len(server.messages)} recibidos"
+                )
+        finally:
+            close_pooled_connections()
+            server.stop()
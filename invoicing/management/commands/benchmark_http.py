@@ -0,0 +1,102 @@
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def process_tree_rss(pid):
+    """Memoria residente (KiB) del proceso y sus descendientes, leída de /proc (Linux)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP de los endpoints de facturación, para comparar el '
+        'despliegue síncrono (gunicorn backend.wsgi) con el asíncrono '
+        '(gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker) '
+        'con el mismo número de workers (-w) y comparar también su memoria con --server-pid'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--token', required=True)
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Ruta a probar (repetible), p. ej. /api/invoicing/async/invoices/dashboard/?company_id=1'
+        )
+        parser.add_argument('--post-data', help='Cuerpo JSON: las rutas se piden con POST')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--server-pid', type=int, help='PID del proceso maestro del servidor')
+
+    def handle(self, *args, **options):
+        if not options['paths']:
+            raise CommandError('Indique al menos una ruta con --path')
+
+        for path in options['paths']:
+            self.run(path, options)
+
+        if options['server_pid']:
+            rss = process_tree_rss(options['server_pid'])
+            self.stdout.write(f"Memoria del servidor (RSS, con sus workers): {rss / 1024:.1f} MiB")
+
+    def run(self, path, options):
+        url = options['base_url'].rstrip('/') + path
+        headers = {'Authorization': f"Token {options['token']}"}
+        body = None
+        if options['post_data'] is not None:
+            body = options['post_data'].encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        def fetch(_):
+            request = urllib.request.Request(url, data=body, headers=headers)
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                    ok = response.status < 400
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return time.perf_counter() - start, ok
+
+        fetch(None)  # calentamiento
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(timing for timing, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f"{path}: {len(results) / elapsed:8.1f} req/s, "
+            f"p50 {timings[len(timings) // 2] * 1000:7.1f} ms, "
+            f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.1f} ms, "
+            f"errores {errors}/{len(results)}"
+        )
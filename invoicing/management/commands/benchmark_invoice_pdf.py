@@ -0,0 +1,48 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from invoicing.pdf import render_invoice_pdf
+
+
+def sample_invoice_data(lines):
+    items = [
+        (f"Producto de prueba {index}", Decimal('2.50'), Decimal('12500.00'), Decimal('31250.00'))
+        for index in range(lines)
+    ]
+    total = sum((item[3] for item in items), Decimal('0'))
+    return {
+        'invoice_number': '2026-0001',
+        'issue_date': '01/01/2026',
+        'customer_name': 'Cliente de Prueba',
+        'customer_email': 'cliente@example.com',
+        'subtotal': total,
+        'total': total,
+        'items': items,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de renderizado del PDF de facturas según el número de líneas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        for lines in options['lines']:
+            data = sample_invoice_data(lines)
+            render_invoice_pdf(data)  # calentamiento
+
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                pdf = render_invoice_pdf(data)
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            self.stdout.write(
+                f"{lines:>6} líneas: mediana {timings[len(timings) // 2] * 1000:8.1f} ms, "
+                f"mínimo {timings[0] * 1000:8.1f} ms, {len(pdf) // 1024} KiB"
+            )
@@ -0,0 +1,147 @@
+import random
+import time
+from datetime import datetime, time as day_time, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+
+from invoicing.models import CustomerUser, DailyCompanySales, Invoice
+from invoicing.rollups import rebuild, reporting_timezone, reporting_today, sales_trends
+from marketplace.models import Company
+
+# Ventana y agrupación de cada período de InvoiceViewSet.summary
+PERIODS = {
+    'month': (30, 'day'),
+    'quarter': (90, 'week'),
+    'year': (365, 'month'),
+}
+RAW_TRUNCATIONS = {
+    'day': TruncDate,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+STATUSES = ['BORRADOR', 'EMITIDA', 'PAGADA', 'ANULADA']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el resumen de ventas (summary) sobre el acumulado diario frente a la '
+        'agregación directa sobre las facturas, con facturas sintéticas (se descartan al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int, required=True)
+        parser.add_argument('--invoices', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company_id'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company_id']} does not exist")
+
+        try:
+            with transaction.atomic():
+                self.create_invoices(company, options['invoices'], options['days'])
+                self.run(company, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def create_invoices(self, company, count, days):
+        rng = random.Random(0)
+        start = time.perf_counter()
+        customer = CustomerUser.objects.create(
+            email='bench-trends@example.com', username='bench-trends', password='!'
+        )
+        today = reporting_today()
+        tz = reporting_timezone()
+        per_day, extra = divmod(count, days)
+        number = 0
+        for offset in range(days):
+            batch = []
+            for _ in range(per_day + (1 if offset < extra else 0)):
+                number += 1
+                batch.append(Invoice(
+                    company=company,
+                    customer=customer,
+                    invoice_number=f"BENCH-{number}",
+                    status=rng.choice(STATUSES),
+                    subtotal=Decimal(rng.randrange(1000, 1000000)),
+                    total=Decimal(rng.randrange(1000, 1000000)),
+                ))
+            if not batch:
+                continue
+            # created_at es auto_now_add: se fija por día después de insertar
+            created = Invoice.objects.bulk_create(batch, batch_size=5000)
+            day = datetime.combine(today - timedelta(days=offset), day_time(12), tzinfo=tz)
+            Invoice.objects.filter(
+                pk__range=(created[0].pk, created[-1].pk)
+            ).update(created_at=day)
+        self.stdout.write(f"{count} facturas creadas en {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        rows = rebuild(company.pk)
+        self.stdout.write(f"Acumulado reconstruido en {time.perf_counter() - start:.1f} s ({rows} filas)")
+
+    def rollup_summary(self, company_id, start_date, today, granularity):
+        """Las dos consultas de InvoiceViewSet.summary, sobre DailyCompanySales."""
+        daily_sales = DailyCompanySales.objects.filter(company_id=company_id)
+        summary = list(daily_sales.filter(date__range=(start_date, today)).values('status').annotate(
+            count=Sum('invoice_count'),
+            total_amount=Sum('amount')
+        ).filter(count__gt=0).order_by('status'))
+        return summary, sales_trends(daily_sales, start_date, today, granularity)
+
+    def raw_summary(self, company_id, start_date, today, granularity):
+        """Las mismas agregaciones directamente sobre la tabla de facturas."""
+        tz = reporting_timezone()
+        invoices = Invoice.objects.filter(
+            company_id=company_id,
+            created_at__gte=datetime.combine(start_date, day_time.min, tzinfo=tz),
+            created_at__lt=datetime.combine(today + timedelta(days=1), day_time.min, tzinfo=tz)
+        )
+        summary = list(invoices.values('status').annotate(
+            count=Count('id'),
+            total_amount=Sum('total')
+        ).order_by('status'))
+        trends = list(invoices.annotate(
+            period=RAW_TRUNCATIONS[granularity]('created_at', tzinfo=tz)
+        ).values('period').annotate(
+            count=Count('id'),
+            total_amount=Sum('total')
+        ).order_by('period'))
+        return summary, trends
+
+    def percentiles(self, timings):
+        timings = sorted(timings)
+        return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95)] * 1000
+
+    def run(self, company, repeat):
+        today = reporting_today()
+        for period, (days, granularity) in PERIODS.items():
+            start_date = today - timedelta(days=days)
+            results = {}
+            for label, summary in (('rollup', self.rollup_summary), ('raw', self.raw_summary)):
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    rows, _ = summary(company.pk, start_date, today, granularity)
+                    timings.append(time.perf_counter() - start)
+                results[label] = sum(row['count'] for row in rows)
+                p50, p95 = self.percentiles(timings)
+                self.stdout.write(
+                    f"{period:>8} {label:>7}: p50 {p50:8.1f} ms, p95 {p95:8.1f} ms ({repeat} consultas)"
+                )
+            if results['rollup'] != results['raw']:
+                self.stdout.write(self.style.ERROR(
+                    f"{period:>8}: el acumulado suma {results['rollup']} facturas y la tabla {results['raw']}"
+                ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from invoicing.models import Invoice
+from invoicing.totals import items_total_expression, recalculate
+
+
+class Command(BaseCommand):
+    help = 'Detecta facturas cuyo subtotal/total no coincide con la suma de sus ítems'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int, default=None,
+                            help='Revisar solo las facturas de esta empresa')
+        parser.add_argument('--fix', action='store_true',
+                            help='Recalcular los totales de las facturas con diferencias')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = Invoice.objects.all()
+        if options['company_id']:
+            queryset = queryset.filter(company_id=options['company_id'])
+
+        drifted = queryset.annotate(
+            items_total=items_total_expression()
+        ).filter(
+            ~Q(subtotal=F('items_total')) | ~Q(total=F('items_total'))
+        ).order_by().values_list('id', 'invoice_number', 'subtotal', 'total', 'items_total')
+
+        ids = []
+        for invoice_id, number, subtotal, total, items_total in drifted.iterator(chunk_size=options['chunk_size']):
+            ids.append(invoice_id)
+            self.stdout.write(
+                f"Factura {number} (id={invoice_id}): subtotal={subtotal} "
+                f"total={total} suma ítems={items_total}"
+            )
+
+        if not ids:
+            self.stdout.write(self.style.SUCCESS("Todos los totales coinciden"))
+            return
+
+        if options['fix']:
+            for start in range(0, len(ids), options['chunk_size']):
+                recalculate(ids[start:start + options['chunk_size']])
+            self.stdout.write(self.style.SUCCESS(f"{len(ids)} facturas corregidas"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(ids)} facturas con diferencias"))
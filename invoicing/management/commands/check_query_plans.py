@@ -0,0 +1,164 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from invoicing.dashboard import _queries as dashboard_queries
+from invoicing.models import DailyCompanySales, Invoice
+from invoicing.rollups import reporting_today
+from invoicing.views import InvoiceViewSet
+from marketplace.models import Company
+from marketplace.views import ProductViewSet
+
+# Cómo aparece en el plan una ordenación que no resuelve el índice
+SORT_MARKERS = ('USE TEMP B-TREE FOR ORDER BY', 'Sort Key:')
+
+
+def list_queryset(viewset_class, user, **params):
+    """
+    Consulta de la primera página del listado de `viewset_class` tal como la
+    ejecuta la vista: su get_queryset() y filtros con los parámetros dados,
+    el orden del paginador por cursor y su límite.
+    """
+    request = Request(APIRequestFactory().get('/', params))
+    request.user = user
+    view = viewset_class(request=request, action='list', args=(), kwargs={}, format_kwarg=None)
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    ordering = paginator.get_ordering(request, queryset, view)
+    return queryset.order_by(*ordering)[:paginator.get_page_size(request) + 1]
+
+
+def hot_queries(company_id):
+    """
+    Consultas de los endpoints más usados, el índice (o índices alternativos)
+    que deben aprovechar y si ese índice también debe dar el orden (sin
+    ordenar en memoria).
+
+    El listado sin ?company_id filtra por todas las empresas del dueño: con
+    varias, ningún índice por empresa da el orden de la paginación y se
+    ordenan en memoria sus facturas, así que con varias empresas solo se exige
+    un índice que empiece por la empresa.
+    """
+    company = Company.objects.select_related('user').get(pk=company_id)
+    owner = company.user
+    single_company = not Company.objects.filter(user=owner).exclude(pk=company_id).exists()
+    # Un cliente real de la empresa (o su dueño si aún no tiene facturas)
+    customer_id = Invoice.objects.filter(company_id=company_id).values_list(
+        'customer_id', flat=True
+    ).first() or owner.pk
+
+    now = timezone.now()
+    today = reporting_today()
+    dashboard = dashboard_queries(company_id, {'upcoming_due', 'overdue', 'recent_activity'})
+    return [
+        (
+            'invoices list',
+            list_queryset(InvoiceViewSet, owner),
+            'invoicing_inv_company_created' if single_company else 'invoicing_inv_company_',
+            single_company,
+        ),
+        (
+            'invoices list (company)',
+            list_queryset(InvoiceViewSet, owner, company_id=company_id),
+            'invoicing_inv_company_created',
+            True,
+        ),
+        (
+            # Ordena en memoria solo las facturas del rango
+            'invoices list (issue_date range)',
+            list_queryset(
+                InvoiceViewSet, owner,
+                date_from=(now - timedelta(days=30)).isoformat(), date_to=now.isoformat()
+            ),
+            'invoicing_inv_company_issue',
+            False,
+        ),
+        (
+            'invoices list (customer)',
+            list_queryset(InvoiceViewSet, owner, customer_id=customer_id),
+            'invoicing_inv_customer_created',
+            True,
+        ),
+        (
+            'dashboard upcoming due / overdue',
+            dashboard['stats'],
+            'invoicing_inv_company_due',
+            False,
+        ),
+        (
+            'dashboard recent activity',
+            dashboard['recent_activity'],
+            'invoicing_inv_company_updated',
+            True,
+        ),
+        (
+            # Como InvoiceViewSet.summary
+            'summary (daily sales rollup)',
+            DailyCompanySales.objects.filter(
+                company_id=company_id, date__range=(today - timedelta(days=365), today)
+            ).values('status').annotate(count=Sum('invoice_count'), total_amount=Sum('amount')).order_by('status'),
+            # En SQLite el índice de la restricción única no lleva su nombre
+            ('invoicing_daily_sales_uniq', 'sqlite_autoindex_invoicing_dailycompanysales'),
+            False,
+        ),
+        (
+            'products by company',
+            list_queryset(ProductViewSet, owner, company=company_id),
+            'marketplace_product_company_id',
+            True,
+        ),
+    ]
+
+
+def explain_hot_queries(company_id):
+    """
+    Resultado de cada consulta de `hot_queries`: (nombre, plan, errores).
+
+    Debe ejecutarse dentro de una transacción: en PostgreSQL se desactivan
+    los recorridos secuenciales solo para ella (SET LOCAL), porque con tablas
+    pequeñas los prefiere y se quiere comprobar que el índice es utilizable.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    for name, queryset, index_name, ordered_by_index in hot_queries(company_id):
+        plan = queryset.explain()
+        index_names = (index_name,) if isinstance(index_name, str) else index_name
+        errors = []
+        if not any(index in plan for index in index_names):
+            errors.append(f"no usa {' ni '.join(index_names)}")
+        if ordered_by_index and any(marker in plan for marker in SORT_MARKERS):
+            errors.append("ordena en memoria")
+        yield name, plan, errors
+
+
+class Command(BaseCommand):
+    help = 'Verifica con EXPLAIN que las consultas frecuentes usan sus índices compuestos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int, default=1)
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Mostrar el plan completo de cada consulta')
+
+    def handle(self, *args, **options):
+        failures = []
+
+        with transaction.atomic():
+            for name, plan, errors in explain_hot_queries(options['company_id']):
+                if options['verbose_plans']:
+                    self.stdout.write(plan)
+                if not errors:
+                    self.stdout.write(self.style.SUCCESS(f"OK    {name}"))
+                else:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FALLA {name}: {', '.join(errors)}"))
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} consultas no usan el índice esperado")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.mail import close_pooled_connections
+from invoicing.jobs import default_worker_id, process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de trabajos de facturas (envío de emails con PDF)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Trabajos reclamados por iteración')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--once', action='store_true',
+                            help='Procesa un solo lote y termina')
+        parser.add_argument('--worker-id', default=None,
+                            help='Identificador del worker (por defecto host:pid)')
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        self.stdout.write(f"Worker {worker_id} iniciado")
+
+        try:
+            while True:
+                processed = process_jobs(worker_id, batch_size=options['batch_size'])
+                if processed:
+                    self.stdout.write(f"{processed} trabajos procesados")
+                if options['once']:
+                    break
+                if not processed:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write("Worker detenido")
+        finally:
+            close_pooled_connections()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from invoicing.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el acumulado diario de ventas (DailyCompanySales) desde las facturas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int, default=None,
+                            help='Reconstruir solo el acumulado de esta empresa')
+
+    def handle(self, *args, **options):
+        rows = rebuild(company_id=options['company_id'])
+        self.stdout.write(self.style.SUCCESS(f"{rows} filas de acumulado generadas"))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.smtp_server import LocalSMTPServer
+
+
+class Command(BaseCommand):
+    help = (
+        'Servidor SMTP local que recibe los emails sin entregarlos, para desarrollo '
+        'y pruebas (EMAIL_HOST=127.0.0.1, EMAIL_PORT=<puerto>, EMAIL_USE_TLS=False)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--connect-delay', type=float, default=0.0,
+                            help='Segundos de espera por conexión (simula TLS y autenticación)')
+
+    def handle(self, *args, **options):
+        server = LocalSMTPServer(port=options['port'], connect_delay=options['connect_delay']).start()
+        self.stdout.write(f"Servidor SMTP local en 127.0.0.1:{server.port}")
+
+        received = 0
+        try:
+            while True:
+                time.sleep(1)
+                if len(server.messages) != received:
+                    received = len(server.messages)
+                    self.stdout.write(f"{received} mensajes recibidos en {server.connections} conexiones")
+        except KeyboardInterrupt:
+            self.stdout.write("Servidor detenido")
+        finally:
+            server.stop()
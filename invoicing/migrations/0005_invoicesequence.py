@@ -0,0 +1,46 @@
+# Generated by Django 5.1 on 2026-10-18 01:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0004_invoicejob'),
+        ('marketplace', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('INVOICE', 'Número de factura'), ('INTERNAL', 'ID interno')], max_length=10)),
+                ('year', models.PositiveIntegerField(default=0)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Invoice sequence',
+                'verbose_name_plural': 'Invoice sequences',
+            },
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='invoice_number',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='invoice',
+            constraint=models.UniqueConstraint(fields=('company', 'invoice_number'), name='invoicing_invoice_company_number_uniq'),
+        ),
+        migrations.AddField(
+            model_name='invoicesequence',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoice_sequences', to='marketplace.company'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicesequence',
+            constraint=models.UniqueConstraint(fields=('company', 'kind', 'year'), name='invoicing_sequence_company_kind_year_uniq'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1 on 2026-10-18 01:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_daily_sales(apps, schema_editor):
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+
+    Invoice = apps.get_model('invoicing', 'Invoice')
+    DailyCompanySales = apps.get_model('invoicing', 'DailyCompanySales')
+
+    rows = Invoice.objects.annotate(
+        day=TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    ).values('company_id', 'day', 'status').annotate(
+        invoice_count=Count('id'),
+        amount=Sum('total')
+    ).order_by()
+
+    DailyCompanySales.objects.bulk_create([
+        DailyCompanySales(
+            company_id=row['company_id'],
+            date=row['day'],
+            status=row['status'],
+            invoice_count=row['invoice_count'],
+            amount=row['amount'] or 0
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0005_invoicesequence'),
+        ('marketplace', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCompanySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('BORRADOR', 'Borrador'), ('EMITIDA', 'Emitida'), ('PAGADA', 'Pagada'), ('ANULADA', 'Anulada')], max_length=20)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='marketplace.company')),
+            ],
+            options={
+                'verbose_name': 'Daily company sales',
+                'verbose_name_plural': 'Daily company sales',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('company', 'date', 'status'), name='invoicing_daily_sales_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+def regroup_daily_sales(apps, schema_editor):
+    """Reagrupa el acumulado diario en REPORTING_TIME_ZONE."""
+    from zoneinfo import ZoneInfo
+    from django.conf import settings
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncDate
+
+    Invoice = apps.get_model('invoicing', 'Invoice')
+    DailyCompanySales = apps.get_model('invoicing', 'DailyCompanySales')
+    tz = ZoneInfo(getattr(settings, 'REPORTING_TIME_ZONE', settings.TIME_ZONE))
+
+    DailyCompanySales.objects.all().delete()
+    rows = Invoice.objects.annotate(
+        day=TruncDate('created_at', tzinfo=tz)
+    ).values('company_id', 'day', 'status').annotate(
+        invoice_count=Count('id'),
+        amount=Sum('total')
+    ).order_by()
+
+    DailyCompanySales.objects.bulk_create([
+        DailyCompanySales(
+            company_id=row['company_id'],
+            date=row['day'],
+            status=row['status'],
+            invoice_count=row['invoice_count'],
+            amount=row['amount'] or 0
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0006_dailycompanysales'),
+        ('marketplace', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'created_at'], name='invoicing_inv_company_created'),
+        ),
+        migrations.RunPython(regroup_daily_sales, migrations.RunPython.noop),
+    ]
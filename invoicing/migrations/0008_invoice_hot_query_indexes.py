@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-18 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0007_reporting_timezone'),
+        ('marketplace', '0002_product_company_name_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'status', 'due_date'], name='invoicing_inv_company_due'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', '-updated_at'], name='invoicing_inv_company_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'issue_date'], name='invoicing_inv_company_issue'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['customer', 'created_at'], name='invoicing_inv_customer_created'),
+        ),
+    ]
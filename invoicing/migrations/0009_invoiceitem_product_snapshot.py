@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 01:42
+
+from django.db import migrations, models
+
+
+def backfill_product_snapshot(apps, schema_editor):
+    from django.db.models import OuterRef, Subquery
+
+    InvoiceItem = apps.get_model('invoicing', 'InvoiceItem')
+    Product = apps.get_model('marketplace', 'Product')
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+
+    InvoiceItem.objects.update(
+        product_name=Subquery(product.values('name')[:1]),
+        product_price=Subquery(product.values('price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0008_invoice_hot_query_indexes'),
+        ('marketplace', '0002_product_company_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='product_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_product_snapshot, migrations.RunPython.noop),
+    ]
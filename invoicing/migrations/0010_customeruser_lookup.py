@@ -0,0 +1,120 @@
+# Generated by Django 5.1 on 2026-10-18 01:52
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+TRIGRAM_INDEX_NAME = 'invoicing_cust_lookup_name_trgm'
+
+# Copia de la normalización de invoicing.lookup al crear la migración: los
+# cambios posteriores en ese módulo no deben alterar lo que hace
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+NON_ALPHANUMERIC_RE = re.compile(r'[^0-9A-Za-z]')
+NON_DIGIT_RE = re.compile(r'\D')
+
+
+def tokenize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return TOKEN_RE.findall(''.join(char for char in decomposed if not unicodedata.combining(char)).lower())
+
+
+def normalize_name(*parts):
+    return ' '.join(token for part in parts for token in tokenize(part))
+
+
+def lookup_fields(customer):
+    return {
+        'lookup_name': normalize_name(customer.first_name, customer.last_name)[:301],
+        'lookup_name_reversed': normalize_name(customer.last_name, customer.first_name)[:301],
+        'lookup_identification': NON_ALPHANUMERIC_RE.sub('', customer.identification_number or '').upper()[:20],
+        'lookup_phone': NON_DIGIT_RE.sub('', customer.phone_number or '')[:15],
+    }
+
+
+def populate_lookup_fields(apps, schema_editor):
+    CustomerUser = apps.get_model('invoicing', 'CustomerUser')
+    fields = ['lookup_name', 'lookup_name_reversed', 'lookup_identification', 'lookup_phone']
+    customers = CustomerUser.objects.only(
+        'id', 'first_name', 'last_name', 'identification_number', 'phone_number'
+    )
+    batch = []
+    for customer in customers.iterator(chunk_size=2000):
+        for field, value in lookup_fields(customer).items():
+            setattr(customer, field, value)
+        batch.append(customer)
+        if len(batch) == 2000:
+            CustomerUser.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        CustomerUser.objects.bulk_update(batch, fields)
+
+
+def create_trigram_index(apps, schema_editor):
+    # Búsqueda dentro del nombre (LIKE '%...%' y similitud): solo PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX {TRIGRAM_INDEX_NAME} ON invoicing_customeruser "
+        "USING gin (lookup_name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('invoicing', '0009_invoiceitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customeruser',
+            name='lookup_identification',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customeruser',
+            name='lookup_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=301),
+        ),
+        migrations.AddField(
+            model_name='customeruser',
+            name='lookup_name_reversed',
+            field=models.CharField(blank=True, default='', editable=False, max_length=301),
+        ),
+        migrations.AddField(
+            model_name='customeruser',
+            name='lookup_phone',
+            field=models.CharField(blank=True, default='', editable=False, max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='customeruser',
+            index=models.Index(fields=['lookup_name'], name='invoicing_cust_lookup_name', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customeruser',
+            index=models.Index(fields=['lookup_name_reversed'], name='invoicing_cust_lookup_rname', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customeruser',
+            index=models.Index(fields=['lookup_identification'], name='invoicing_cust_lookup_ident', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customeruser',
+            index=models.Index(fields=['lookup_phone'], name='invoicing_cust_lookup_phone', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customeruser',
+            index=models.Index(fields=['email'], name='invoicing_cust_email_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(populate_lookup_fields, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
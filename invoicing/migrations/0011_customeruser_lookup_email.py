@@ -0,0 +1,45 @@
+# Generated by Django 5.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def normalize_email(value):
+    # Copia de invoicing.lookup.normalize_email al crear la migración
+    return (value or '').strip().lower()
+
+
+def populate_lookup_email(apps, schema_editor):
+    CustomerUser = apps.get_model('invoicing', 'CustomerUser')
+    batch = []
+    for customer in CustomerUser.objects.only('id', 'email').iterator(chunk_size=2000):
+        customer.lookup_email = normalize_email(customer.email)[:254]
+        batch.append(customer)
+        if len(batch) == 2000:
+            CustomerUser.objects.bulk_update(batch, ['lookup_email'])
+            batch = []
+    if batch:
+        CustomerUser.objects.bulk_update(batch, ['lookup_email'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0010_customeruser_lookup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customeruser',
+            name='invoicing_cust_email_prefix',
+        ),
+        migrations.AddField(
+            model_name='customeruser',
+            name='lookup_email',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddIndex(
+            model_name='customeruser',
+            index=models.Index(fields=['lookup_email'], name='invoicing_cust_lookup_email', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(populate_lookup_email, migrations.RunPython.noop),
+    ]
@@ -32,6 +32,10 @@ class CustomerUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+# Campos de los que se derivan los valores lookup_* de CustomerUser
+LOOKUP_SOURCE_FIELDS = {'first_name', 'last_name', 'identification_number', 'phone_number', 'email'}
+
+
 class CustomerUser(AbstractUser):
     username = models.CharField(
         _('username'),
@@ -70,6 +74,13 @@ class CustomerUser(AbstractUser):
         blank=True
     )
 
+    # Valores normalizados para la búsqueda de clientes (ver invoicing.lookup)
+    lookup_name = models.CharField(max_length=301, blank=True, default='', editable=False)
+    lookup_name_reversed = models.CharField(max_length=301, blank=True, default='', editable=False)
+    lookup_identification = models.CharField(max_length=20, blank=True, default='', editable=False)
+    lookup_phone = models.CharField(max_length=15, blank=True, default='', editable=False)
+    lookup_email = models.CharField(max_length=254, blank=True, default='', editable=False)
+
     objects = CustomerUserManager()
 
     USERNAME_FIELD = 'email'
@@ -78,13 +89,37 @@ class CustomerUser(AbstractUser):
     class Meta:
         verbose_name = _('Cliente Usuario')
         verbose_name_plural = _('Clientes Usuarios')
+        indexes = [
+            # Búsquedas por prefijo del autocompletado; varchar_pattern_ops solo aplica en PostgreSQL
+            models.Index(fields=['lookup_name'], name='invoicing_cust_lookup_name', opclasses=['varchar_pattern_ops']),
+            models.Index(
+                fields=['lookup_name_reversed'],
+                name='invoicing_cust_lookup_rname',
+                opclasses=['varchar_pattern_ops']
+            ),
+            models.Index(
+                fields=['lookup_identification'],
+                name='invoicing_cust_lookup_ident',
+                opclasses=['varchar_pattern_ops']
+            ),
+            models.Index(fields=['lookup_phone'], name='invoicing_cust_lookup_phone', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['lookup_email'], name='invoicing_cust_lookup_email', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.email
 
     def save(self, *args, **kwargs):
+        from .lookup import lookup_fields
+
         if not self.username:
             self.username = self.email.split('@')[0]
+        lookup = lookup_fields(self)
+        for field, value in lookup.items():
+            setattr(self, field, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and LOOKUP_SOURCE_FIELDS & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, *lookup}
         super().save(*args, **kwargs)
 
     def get_total_invoices(self):
@@ -93,6 +128,7 @@ class CustomerUser(AbstractUser):
     def get_total_amount(self):
         return self.invoice_set.aggregate(total=Sum('total_amount'))['total'] or 0
 
+from decimal import Decimal
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -118,7 +154,7 @@ class Invoice(models.Model):
         on_delete=models.PROTECT,
         related_name='invoices'
     )
-    invoice_number = models.CharField(max_length=50, unique=True)
+    invoice_number = models.CharField(max_length=50)
     internal_id = models.CharField(
         max_length=20,
         unique=True,
@@ -152,75 +188,80 @@ class Invoice(models.Model):
         ordering = ['-created_at']
         verbose_name = _("Invoice")
         verbose_name_plural = _("Invoices")
+        indexes = [
+            # Cubre los filtros por empresa y rango de creación (resumen y reconstrucción del acumulado)
+            models.Index(fields=['company', 'created_at'], name='invoicing_inv_company_created'),
+            # Facturas por vencer y vencidas del dashboard
+            models.Index(fields=['company', 'status', 'due_date'], name='invoicing_inv_company_due'),
+            # Actividad reciente del dashboard
+            models.Index(fields=['company', '-updated_at'], name='invoicing_inv_company_updated'),
+            # Filtros de listado por rango de fecha de emisión y por cliente
+            models.Index(fields=['company', 'issue_date'], name='invoicing_inv_company_issue'),
+            models.Index(fields=['customer', 'created_at'], name='invoicing_inv_customer_created'),
+        ]
+        constraints = [
+            # La numeración es consecutiva por empresa, no global
+            models.UniqueConstraint(
+                fields=['company', 'invoice_number'],
+                name='invoicing_invoice_company_number_uniq'
+            ),
+        ]
 
     @classmethod
-    def generate_invoice_number(cls, company_id):
+    def generate_invoice_number(cls, company_id, issue_date=None):
         """
         Genera un número de factura único para una empresa.
         
         Args:
             company_id (int): ID de la empresa para la que se genera el número de factura.
+            issue_date (datetime): Fecha de emisión, que define el año (por defecto, ahora).
         
         Returns:
-            str: Número de factura único.
+            str: Número de factura único (AAAA-NNNN), consecutivo por empresa y año.
         """
-        try:
-            # Obtener la última factura para esta empresa
-            last_invoice = cls.objects.filter(
-                company_id=company_id
-            ).order_by('-id').first()
-
-            # Obtener el año actual
-            current_year = timezone.now().year
-
-            # Si no hay facturas previas, comenzar con 0001
-            if not last_invoice:
-                return f"{current_year}-0001"
-
-            # Extraer el último número de la factura previa
-            try:
-                last_number = int(last_invoice.invoice_number.split('-')[-1])
-            except (ValueError, IndexError):
-                last_number = 0
-
-            # Generar un nuevo número
-            new_number = f"{current_year}-{last_number + 1:04d}"
-
-            # Verificar unicidad
-            counter = 1
-            while cls.objects.filter(
-                invoice_number=new_number, 
-                company_id=company_id
-            ).exists():
-                new_number = f"{current_year}-{last_number + counter:04d}"
-                counter += 1
-
-            return new_number
-
-        except Exception as e:
-            # Loguear el error si es necesario
-            raise ValueError(f"No se pudo generar un número de factura único: {str(e)}")
+        from .sequences import next_invoice_number
+        return next_invoice_number(company_id, issue_date)
 
     @classmethod
     def generate_internal_id(cls, company_id):
         """Genera un ID interno único para la factura basado en la empresa."""
-        last_invoice = cls.objects.filter(company_id=company_id).order_by('-internal_id').first()
-        if last_invoice and last_invoice.internal_id:
-            last_number = int(last_invoice.internal_id.split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        return f"INV-{company_id}-{new_number:06d}"
+        from .sequences import next_internal_id
+        return next_internal_id(company_id)
 
     def calculate_totals(self):
-        """Calcula subtotal y total de la factura."""
-        invoice_items = self.invoice_items.all()
-        self.subtotal = sum(item.total for item in invoice_items)
-        self.total = self.subtotal
-        self.save()
+        """Recalcula subtotal y total desde los ítems, actualizando solo esas columnas."""
+        from .totals import recalculate
+        recalculate([self.pk])
+        self.refresh_from_db(fields=['subtotal', 'total', 'updated_at'])
 
-    def send_invoice_email(self):
-        """Envía el email de la factura al cliente y al admin."""
+    def _rollup_values(self):
+        return (self.company_id, self.created_at, self.status, self.total)
+
+    def save(self, *args, **kwargs):
+        from .rollups import record_change
+
+        old = None
+        if not self._state.adding:
+            old = Invoice.objects.filter(pk=self.pk).values_list(
+                'company_id', 'created_at', 'status', 'total'
+            ).first()
+        super().save(*args, **kwargs)
+        # Mantener el acumulado diario de ventas (DailyCompanySales)
+        record_change(old, self._rollup_values())
+
+    def delete(self, *args, **kwargs):
+        from .pdf_cache import invalidate
+        from .rollups import record_change
+
+        old = self._rollup_values()
+        invoice_id = self.pk
+        result = super().delete(*args, **kwargs)
+        record_change(old, None)
+        invalidate(invoice_id)
+        return result
+
+    def build_invoice_email(self):
+        """Email de la factura para el cliente y el admin, con el PDF adjunto."""
         context = {
             'invoice': self,
             'items': self.invoice_items.all(),
@@ -244,11 +285,18 @@ class Invoice(models.Model):
         msg.attach_alternative(html_content, "text/html")
         
         # Generar y adjuntar PDF
-        from .views import InvoiceViewSet
-        pdf = InvoiceViewSet.generate_pdf_file(self)
-        msg.attach(f'invoice_{self.invoice_number}.pdf', pdf.getvalue(), 'application/pdf')
-        
-        msg.send()
+        from .pdf_cache import get_invoice_pdf
+        pdf = get_invoice_pdf(self)
+        msg.attach(f'invoice_{self.invoice_number}.pdf', pdf, 'application/pdf')
+        return msg
+
+    def send_invoice_email(self):
+        """
+        Envía el email de la factura al cliente y al admin. Con
+        PooledEmailBackend reutiliza una conexión SMTP abierta; para varias
+        facturas a la vez, ver `backend.mail.send_many`.
+        """
+        self.build_invoice_email().send()
 
     def __str__(self):
         return f"Factura {self.invoice_number} - {self.customer.get_full_name()}"
@@ -273,10 +321,178 @@ class InvoiceItem(models.Model):
     total = models.DecimalField(max_digits=15, decimal_places=2)
     description = models.TextField(blank=True, null=True)
 
+    # Copia del producto al momento de la venta (evita cargar el producto al listar)
+    product_name = models.CharField(max_length=100, blank=True, default='')
+    product_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores leídos de la base de datos, para mantener los totales por diferencia
+        instance._original_total = instance.__dict__.get('total')
+        instance._original_invoice_id = instance.__dict__.get('invoice_id')
+        instance._original_product_id = instance.__dict__.get('product_id')
+        return instance
+
     def save(self, *args, **kwargs):
-        self.total = self.quantity * self.unit_price
+        from .totals import apply_delta, touch
+
+        self.total = (self.quantity * self.unit_price).quantize(Decimal('0.01'))
+        original_product_id = getattr(self, '_original_product_id', None)
+        product_changed = original_product_id is not None and original_product_id != self.product_id
+        if self._state.adding or not self.product_name or product_changed:
+            self.snapshot_product()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'product_name', 'product_price'}
+
+        old_total = getattr(self, '_original_total', None)
+        old_invoice_id = getattr(self, '_original_invoice_id', None)
+        if not self._state.adding and (old_total is None or old_invoice_id is None):
+            old_invoice_id, old_total = InvoiceItem.objects.filter(
+                pk=self.pk
+            ).values_list('invoice_id', 'total').get()
+
         super().save(*args, **kwargs)
-        self.invoice.calculate_totals()
+
+        if old_invoice_id is not None and old_invoice_id != self.invoice_id:
+            apply_delta(old_invoice_id, -old_total)
+            apply_delta(self.invoice_id, self.total)
+        elif self.total == old_total:
+            touch(self.invoice_id)
+        else:
+            apply_delta(self.invoice_id, self.total - (old_total or 0))
+
+        self._original_total = self.total
+        self._original_invoice_id = self.invoice_id
+        self._original_product_id = self.product_id
+
+    def snapshot_product(self, product=None):
+        """Copia el nombre y precio actuales del producto en el ítem."""
+        product = product or self.product
+        self.product_name = product.name
+        self.product_price = product.price
+
+    def delete(self, *args, **kwargs):
+        from .totals import apply_delta
+
+        invoice_id = self.invoice_id
+        total = self.total
+        result = super().delete(*args, **kwargs)
+        apply_delta(invoice_id, -total)
+        return result
+
+    def __str__(self):
+        return f"{self.product_name or self.product.name} - {self.quantity} unidades"
+
+class InvoiceJob(models.Model):
+    """Trabajo pendiente de entrega de una factura (outbox en base de datos)."""
+    JOB_TYPES = [
+        ('SEND_EMAIL', 'Enviar factura por email'),
+    ]
+
+    JOB_STATUS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_PROCESO', 'En proceso'),
+        ('COMPLETADO', 'Completado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+
+    invoice = models.ForeignKey(
+        Invoice,
+        related_name='jobs',
+        on_delete=models.CASCADE
+    )
+    job_type = models.CharField(max_length=20, choices=JOB_TYPES)
+    status = models.CharField(
+        max_length=20,
+        choices=JOB_STATUS,
+        default='PENDIENTE'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_at']
+        verbose_name = _("Invoice job")
+        verbose_name_plural = _("Invoice jobs")
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='invoicing_job_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} - Factura {self.invoice_id} ({self.status})"
+
+
+class InvoiceSequence(models.Model):
+    """Contador de numeración por empresa, tipo y año."""
+    SEQUENCE_KINDS = [
+        ('INVOICE', 'Número de factura'),
+        ('INTERNAL', 'ID interno'),
+    ]
+
+    company = models.ForeignKey(
+        'marketplace.Company',
+        on_delete=models.CASCADE,
+        related_name='invoice_sequences'
+    )
+    kind = models.CharField(max_length=10, choices=SEQUENCE_KINDS)
+    # 0 para secuencias que no se reinician cada año
+    year = models.PositiveIntegerField(default=0)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _("Invoice sequence")
+        verbose_name_plural = _("Invoice sequences")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'kind', 'year'],
+                name='invoicing_sequence_company_kind_year_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.company_id} {self.kind} {self.year}: {self.last_value}"
+
+
+class DailyCompanySales(models.Model):
+    """Acumulado diario de facturas por empresa y estado (ver invoicing.rollups)."""
+    company = models.ForeignKey(
+        'marketplace.Company',
+        on_delete=models.CASCADE,
+        related_name='daily_sales'
+    )
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=Invoice.INVOICE_STATUS)
+    invoice_count = models.IntegerField(default=0)
+    amount = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=0
+    )
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = _("Daily company sales")
+        verbose_name_plural = _("Daily company sales")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['company', 'date', 'status'],
+                name='invoicing_daily_sales_uniq'
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.product.name} - {self.quantity} unidades"
\ No newline at end of file
+        return f"{self.company_id} {self.date} {self.status}: {self.invoice_count} / {self.amount}"
@@ -0,0 +1,100 @@
+import io
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, TableStyle
+
+# Estilos compartidos por todos los renderizados (se crean una sola vez por proceso)
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = STYLES['Title']
+NORMAL_STYLE = STYLES['Normal']
+
+ITEMS_HEADER = ['Producto', 'Cantidad', 'Precio Unitario', 'Total']
+
+PAGE_MARGIN = inch / 2
+# Anchos fijos: evitan que ReportLab mida cada celda para calcular las columnas
+ITEMS_COL_WIDTHS = [3.5 * inch, 1.0 * inch, 1.5 * inch, 1.5 * inch]
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def invoice_pdf_data(invoice):
+    """
+    Datos de la factura que se imprimen en el PDF, como estructura simple.
+
+    Se puede serializar para renderizar en otro proceso sin acceder al ORM.
+    """
+    return {
+        'invoice_number': invoice.invoice_number,
+        'issue_date': invoice.issue_date.strftime('%d/%m/%Y'),
+        'customer_name': invoice.customer.get_full_name(),
+        'customer_email': invoice.customer.email,
+        'subtotal': invoice.subtotal,
+        'total': invoice.total,
+        'items': [
+            (item.product_name, item.quantity, item.unit_price, item.total)
+            for item in invoice.invoice_items.all()
+        ],
+    }
+
+
+def render_invoice_pdf(data):
+    """
+    Renderiza el PDF de una factura.
+
+    La tabla de ítems se divide entre páginas repitiendo el encabezado, por
+    lo que las facturas largas se paginan en lugar de desbordarse.
+
+    Args:
+        data (dict): Resultado de `invoice_pdf_data`.
+
+    Returns:
+        bytes: Contenido del PDF.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=PAGE_MARGIN,
+        leftMargin=PAGE_MARGIN,
+        topMargin=PAGE_MARGIN,
+        bottomMargin=PAGE_MARGIN,
+        title=f"Factura {data['invoice_number']}"
+    )
+
+    elements = [
+        Paragraph(f"Factura #{escape(data['invoice_number'])}", TITLE_STYLE),
+        Paragraph(f"Fecha: {data['issue_date']}", NORMAL_STYLE),
+        Paragraph(f"Cliente: {escape(data['customer_name'])}", NORMAL_STYLE),
+        Paragraph(f"Email: {escape(data['customer_email'])}", NORMAL_STYLE),
+    ]
+
+    rows = [ITEMS_HEADER]
+    rows.extend(
+        [name, str(quantity), f"${unit_price:,.2f}", f"${total:,.2f}"]
+        for name, quantity, unit_price, total in data['items']
+    )
+    table = LongTable(rows, colWidths=ITEMS_COL_WIDTHS, repeatRows=1, splitByRow=1)
+    table.setStyle(ITEMS_TABLE_STYLE)
+    elements.append(table)
+
+    elements.append(Paragraph(f"Subtotal: ${data['subtotal']:,.2f}", NORMAL_STYLE))
+    elements.append(Paragraph(f"Total: ${data['total']:,.2f}", NORMAL_STYLE))
+
+    doc.build(elements)
+    return buffer.getvalue()
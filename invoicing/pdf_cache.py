@@ -0,0 +1,116 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+
+from .pdf import invoice_pdf_data, render_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar el diseño del PDF para invalidar todo el caché
+PDF_TEMPLATE_VERSION = '2'
+
+_storage = None
+
+
+def get_storage():
+    """Almacenamiento configurado en INVOICE_PDF_CACHE (por defecto disco local)."""
+    global _storage
+    if _storage is None:
+        config = getattr(settings, 'INVOICE_PDF_CACHE', {})
+        backend = import_string(config.get('BACKEND', 'django.core.files.storage.FileSystemStorage'))
+        _storage = backend(**config.get('OPTIONS', {}))
+    return _storage
+
+
+def invoice_pdf_hash(invoice):
+    """
+    Hash del contenido que se imprime en el PDF de la factura.
+
+    Cualquier cambio en la factura, sus ítems o la versión de la plantilla
+    produce un hash distinto, por lo que el caché no requiere invalidación
+    explícita para ser correcto.
+    """
+    customer = invoice.customer
+    parts = [
+        PDF_TEMPLATE_VERSION,
+        invoice.invoice_number,
+        invoice.issue_date.isoformat(),
+        customer.get_full_name(),
+        customer.email,
+        str(invoice.subtotal),
+        str(invoice.total),
+    ]
+    for item in sorted(invoice.invoice_items.all(), key=lambda item: item.pk):
+        parts.extend([
+            item.product_name,
+            str(item.quantity),
+            str(item.unit_price),
+            str(item.total),
+        ])
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _cache_path(invoice_id, content_hash):
+    return f"{invoice_id}/{content_hash}.pdf"
+
+
+def invalidate(invoice_id, keep=None):
+    """Elimina los PDF en caché de una factura (salvo el hash `keep`)."""
+    storage = get_storage()
+    try:
+        _, files = storage.listdir(str(invoice_id))
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        if keep and name == f"{keep}.pdf":
+            continue
+        storage.delete(f"{invoice_id}/{name}")
+
+
+def get_cached_pdf(invoice_id, content_hash):
+    """PDF en caché para ese hash de contenido, o None."""
+    storage = get_storage()
+    path = _cache_path(invoice_id, content_hash)
+    try:
+        if storage.exists(path):
+            with storage.open(path, 'rb') as cached:
+                return cached.read()
+    except Exception as e:
+        logger.error(f"Error reading cached PDF {path}: {str(e)}")
+    return None
+
+
+def store_invoice_pdf(invoice_id, content_hash, pdf):
+    """Guarda el PDF en caché y elimina las versiones anteriores de la factura."""
+    storage = get_storage()
+    path = _cache_path(invoice_id, content_hash)
+    try:
+        invalidate(invoice_id, keep=content_hash)
+        if not storage.exists(path):
+            storage.save(path, ContentFile(pdf))
+    except Exception as e:
+        logger.error(f"Error caching PDF {path}: {str(e)}")
+
+
+def get_invoice_pdf(invoice, content_hash=None):
+    """
+    Devuelve el PDF de la factura, renderizándolo solo si no está en caché.
+
+    Args:
+        invoice (Invoice): Factura con `customer` e `invoice_items` disponibles.
+        content_hash (str): Hash ya calculado con `invoice_pdf_hash`, si existe.
+
+    Returns:
+        bytes: Contenido del PDF.
+    """
+    content_hash = content_hash or invoice_pdf_hash(invoice)
+    pdf = get_cached_pdf(invoice.pk, content_hash)
+    if pdf is not None:
+        return pdf
+
+    pdf = render_invoice_pdf(invoice_pdf_data(invoice))
+    store_invoice_pdf(invoice.pk, content_hash, pdf)
+    return pdf
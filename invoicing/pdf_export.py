@@ -0,0 +1,102 @@
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .pdf import invoice_pdf_data, render_invoice_pdf
+from .pdf_cache import get_cached_pdf, invoice_pdf_hash, store_invoice_pdf
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Pool de procesos compartido por las exportaciones de este worker.
+
+    Se usa `spawn` para que los procesos hijos no hereden las conexiones a la
+    base de datos del proceso web; los hijos solo reciben los datos a
+    imprimir (invoice_pdf_data) y no cargan Django.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'INVOICE_PDF_EXPORT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+    return _executor
+
+
+class _ZipStream:
+    """Destino de escritura sin `seek` para ZipFile: acumula bytes hasta que se consumen."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _render_batch(invoices):
+    """PDFs del lote, en orden: del caché si existen, el resto renderizados en paralelo."""
+    hashes = [invoice_pdf_hash(invoice) for invoice in invoices]
+    pdfs = [get_cached_pdf(invoice.pk, content_hash) for invoice, content_hash in zip(invoices, hashes)]
+    missing = [index for index, pdf in enumerate(pdfs) if pdf is None]
+
+    if missing:
+        data = [invoice_pdf_data(invoices[index]) for index in missing]
+        if getattr(settings, 'INVOICE_PDF_EXPORT_WORKERS', 2) > 0:
+            rendered = get_executor().map(render_invoice_pdf, data)
+        else:
+            rendered = map(render_invoice_pdf, data)
+        for index, pdf in zip(missing, rendered):
+            pdfs[index] = pdf
+            store_invoice_pdf(invoices[index].pk, hashes[index], pdf)
+
+    return pdfs
+
+
+def _write_batch(archive, stream, invoices):
+    for invoice, pdf in zip(invoices, _render_batch(invoices)):
+        # Los números son únicos por empresa: se prefija la empresa para que
+        # una exportación de varias empresas no repita nombres
+        archive.writestr(f"invoice_{invoice.company_id}_{invoice.invoice_number}.pdf", pdf)
+        yield stream.pop()
+
+
+def stream_invoice_pdfs_zip(queryset, batch_size=None):
+    """
+    Genera un ZIP con el PDF de cada factura, entregándolo por partes.
+
+    Las facturas se leen por lotes con sus clientes e ítems precargados; cada
+    lote se renderiza en paralelo y sus PDFs se escriben en el ZIP y se
+    entregan antes de leer el siguiente, así la memoria usada no depende del
+    número de facturas.
+    """
+    batch_size = batch_size or getattr(settings, 'INVOICE_PDF_EXPORT_BATCH_SIZE', 50)
+    stream = _ZipStream()
+
+    # Los PDF de ReportLab ya van comprimidos: se guardan sin volver a comprimir
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        batch = []
+        for invoice in queryset.iterator(chunk_size=batch_size):
+            batch.append(invoice)
+            if len(batch) == batch_size:
+                yield from _write_batch(archive, stream, batch)
+                batch = []
+        if batch:
+            yield from _write_batch(archive, stream, batch)
+
+    yield stream.pop()
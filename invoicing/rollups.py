@@ -0,0 +1,185 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyCompanySales, Invoice
+
+
+def reporting_timezone():
+    """Zona horaria en la que se agrupan las ventas por día (REPORTING_TIME_ZONE)."""
+    return ZoneInfo(getattr(settings, 'REPORTING_TIME_ZONE', settings.TIME_ZONE))
+
+
+def reporting_today():
+    return timezone.localdate(timezone.now(), reporting_timezone())
+
+
+def invoice_day(created_at):
+    """Día (en la zona horaria de reportes) al que se asigna una factura."""
+    return timezone.localdate(created_at, reporting_timezone())
+
+
+PERIOD_TRUNCATIONS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def truncate_day(day, granularity):
+    """Primer día del período (día, semana que empieza en lunes o mes) que contiene `day`."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def period_range(start, end, granularity):
+    """Inicios de todos los períodos entre `start` y `end`, ambos incluidos."""
+    current = truncate_day(start, granularity)
+    while current <= end:
+        yield current
+        if granularity == 'week':
+            current += timedelta(days=7)
+        elif granularity == 'month':
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+
+
+def sales_trends(queryset, start, end, granularity):
+    """
+    Ventas del acumulado diario agrupadas por período, con ceros en los
+    períodos sin facturas.
+
+    Args:
+        queryset (QuerySet): Filas de DailyCompanySales ya filtradas.
+        start (date): Primer día incluido.
+        end (date): Último día incluido.
+        granularity (str): 'day', 'week' o 'month'.
+
+    Returns:
+        list: [{'period', 'count', 'total_amount'}] ordenado por período.
+    """
+    truncation = PERIOD_TRUNCATIONS[granularity]
+    period = truncation('date') if truncation else F('date')
+
+    rows = queryset.filter(date__range=(start, end)).annotate(
+        period=period
+    ).values('period').annotate(
+        count=Sum('invoice_count'),
+        total_amount=Sum('amount')
+    ).order_by('period')
+    by_period = {row['period']: row for row in rows}
+
+    return [
+        {
+            'period': day,
+            'count': by_period.get(day, {}).get('count') or 0,
+            'total_amount': by_period.get(day, {}).get('total_amount') or Decimal('0'),
+        }
+        for day in period_range(start, end, granularity)
+    ]
+
+
+def record(company_id, day, status, count=0, amount=Decimal('0')):
+    """Suma `count` facturas y `amount` al acumulado diario indicado."""
+    if not count and not amount:
+        return
+
+    filters = {'company_id': company_id, 'date': day, 'status': status}
+    updated = DailyCompanySales.objects.filter(**filters).update(
+        invoice_count=F('invoice_count') + count,
+        amount=F('amount') + amount
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyCompanySales.objects.create(invoice_count=count, amount=amount, **filters)
+    except IntegrityError:
+        # Otra petición creó la fila al mismo tiempo
+        DailyCompanySales.objects.filter(**filters).update(
+            invoice_count=F('invoice_count') + count,
+            amount=F('amount') + amount
+        )
+
+
+def record_change(old, new):
+    """
+    Aplica al acumulado el cambio de una factura.
+
+    Args:
+        old (tuple|None): (company_id, created_at, status, total) antes del cambio.
+        new (tuple|None): (company_id, created_at, status, total) después del cambio.
+    """
+    if old == new:
+        return
+    if old and new and old[:3] == new[:3]:
+        company_id, created_at, status, _ = new
+        record(company_id, invoice_day(created_at), status, amount=new[3] - old[3])
+        return
+    if old:
+        company_id, created_at, status, total = old
+        record(company_id, invoice_day(created_at), status, count=-1, amount=-total)
+    if new:
+        company_id, created_at, status, total = new
+        record(company_id, invoice_day(created_at), status, count=1, amount=total)
+
+
+def record_invoices(invoices):
+    """Suma al acumulado un lote de facturas nuevas (por ejemplo tras un bulk_create)."""
+    groups = defaultdict(lambda: [0, Decimal('0')])
+    for invoice in invoices:
+        key = (invoice.company_id, invoice_day(invoice.created_at), invoice.status)
+        groups[key][0] += 1
+        groups[key][1] += invoice.total
+    for (company_id, day, status), (count, amount) in groups.items():
+        record(company_id, day, status, count=count, amount=amount)
+
+
+@transaction.atomic
+def rebuild(company_id=None):
+    """
+    Reconstruye el acumulado diario desde la tabla de facturas.
+
+    Returns:
+        int: Número de filas generadas.
+    """
+    rows = DailyCompanySales.objects.all()
+    invoices = Invoice.objects.all()
+    if company_id:
+        rows = rows.filter(company_id=company_id)
+        invoices = invoices.filter(company_id=company_id)
+    rows.delete()
+
+    aggregated = invoices.annotate(
+        day=TruncDate('created_at', tzinfo=reporting_timezone())
+    ).values('company_id', 'day', 'status').annotate(
+        invoice_count=Count('id'),
+        amount=Sum('total')
+    ).order_by()
+
+    created = DailyCompanySales.objects.bulk_create(
+        (
+            DailyCompanySales(
+                company_id=row['company_id'],
+                date=row['day'],
+                status=row['status'],
+                invoice_count=row['invoice_count'],
+                amount=row['amount'] or 0
+            )
+            for row in aggregated.iterator()
+        ),
+        batch_size=1000
+    )
+    return len(created)
@@ -0,0 +1,207 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Invoice, InvoiceSequence
+
+logger = logging.getLogger(__name__)
+
+# Bloques reservados por este proceso: {(company_id, kind, year): [siguiente, último]}
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def _supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        import sqlite3
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _legacy_last_value(company_id, kind, year):
+    """Último número ya emitido antes de existir la secuencia (solo se consulta una vez)."""
+    if kind == 'INVOICE':
+        prefix = f"{year}-"
+        values = Invoice.objects.filter(
+            company_id=company_id,
+            invoice_number__startswith=prefix
+        ).values_list('invoice_number', flat=True)
+    else:
+        prefix = f"INV-{company_id}-"
+        values = Invoice.objects.filter(
+            company_id=company_id,
+            internal_id__startswith=prefix
+        ).values_list('internal_id', flat=True)
+
+    last_value = 0
+    for value in values:
+        try:
+            last_value = max(last_value, int(value[len(prefix):]))
+        except ValueError:
+            continue
+    return last_value
+
+
+def _increment(company_id, kind, year, count):
+    """Incrementa la secuencia y devuelve el nuevo último valor, o None si no existe."""
+    if _supports_returning():
+        table = connection.ops.quote_name(InvoiceSequence._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET last_value = last_value + %s "
+                f"WHERE company_id = %s AND kind = %s AND year = %s "
+                f"RETURNING last_value",
+                [count, company_id, kind, year]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # Sin RETURNING: el UPDATE deja la fila bloqueada hasta el final de la transacción
+    updated = InvoiceSequence.objects.filter(
+        company_id=company_id, kind=kind, year=year
+    ).update(last_value=F('last_value') + count)
+    if not updated:
+        return None
+    return InvoiceSequence.objects.filter(
+        company_id=company_id, kind=kind, year=year
+    ).values_list('last_value', flat=True).get()
+
+
+def allocate(company_id, kind, year=0, count=1):
+    """
+    Reserva `count` valores consecutivos de la secuencia.
+
+    La reserva es un único UPDATE sobre la fila de la secuencia, que queda
+    bloqueada hasta que termina la transacción en curso: si la transacción se
+    revierte, los números vuelven a estar disponibles (numeración sin huecos).
+
+    Args:
+        company_id (int): ID de la empresa.
+        kind (str): 'INVOICE' o 'INTERNAL'.
+        year (int): Año de la secuencia, 0 si no se reinicia anualmente.
+        count (int): Cantidad de valores a reservar.
+
+    Returns:
+        tuple: (primero, último) valores reservados, ambos incluidos.
+    """
+    with transaction.atomic():
+        last_value = _increment(company_id, kind, year, count)
+        if last_value is None:
+            try:
+                with transaction.atomic():
+                    InvoiceSequence.objects.create(
+                        company_id=company_id,
+                        kind=kind,
+                        year=year,
+                        last_value=_legacy_last_value(company_id, kind, year)
+                    )
+            except IntegrityError:
+                # Otra petición creó la secuencia al mismo tiempo
+                pass
+            last_value = _increment(company_id, kind, year, count)
+
+    return last_value - count + 1, last_value
+
+
+def allocate_committed(company_id, kind, year=0, count=1):
+    """
+    Como `allocate`, pero confirma la reserva de inmediato aunque haya una
+    transacción en curso: se ejecuta en un hilo con su propia conexión (en
+    autocommit). Si la transacción de quien pidió los valores se revierte, el
+    rango sigue reservado (quedan huecos) y ningún otro proceso lo reserva.
+    """
+    result = {}
+
+    def run():
+        try:
+            result['values'] = allocate(company_id, kind, year, count)
+        except Exception as e:
+            result['error'] = e
+        finally:
+            # Solo cierra las conexiones de este hilo
+            connections.close_all()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['values']
+
+
+def reserve(company_id, kind, year=0, count=1):
+    """
+    Reserva `count` valores y confirma la reserva de inmediato
+    (`allocate_committed`), para no bloquear la fila de la secuencia durante
+    la transacción de quien los pidió. Si esa transacción se revierte, los
+    valores quedan sin usar.
+
+    En SQLite, dentro de una transacción, se reservan en ella (`allocate`):
+    admite un solo escritor y otra conexión esperaría a su bloqueo.
+
+    Returns:
+        tuple: (primero, último) valores reservados, ambos incluidos.
+    """
+    if connection.in_atomic_block and connection.vendor == 'sqlite':
+        return allocate(company_id, kind, year, count)
+    return allocate_committed(company_id, kind, year, count)
+
+
+def next_value(company_id, kind, year=0):
+    """
+    Devuelve el siguiente valor de la secuencia.
+
+    Con `INVOICE_SEQUENCE_BLOCK_SIZE` > 1 cada proceso reserva un bloque de
+    números y los entrega desde memoria, evitando la contención sobre la fila
+    a costa de posibles huecos si el proceso termina sin agotar el bloque. El
+    bloque se reserva en su propia transacción (`allocate_committed`), así que
+    revertir la transacción que lo pidió no lo devuelve a la secuencia
+    mientras este proceso lo sigue usando.
+    """
+    block_size = getattr(settings, 'INVOICE_SEQUENCE_BLOCK_SIZE', 1)
+    if block_size <= 1:
+        return allocate(company_id, kind, year)[0]
+
+    key = (company_id, kind, year)
+    with _blocks_lock:
+        block = _blocks.get(key)
+        if not block or block[0] > block[1]:
+            if connection.in_atomic_block and connection.vendor == 'sqlite':
+                # Ver `reserve`: el bloque no se conservaría fuera de la transacción
+                return allocate(company_id, kind, year)[0]
+            block = list(allocate_committed(company_id, kind, year, count=block_size))
+            _blocks[key] = block
+        value = block[0]
+        block[0] += 1
+    return value
+
+
+def format_invoice_number(year, value):
+    return f"{year}-{value:04d}"
+
+
+def format_internal_id(company_id, value):
+    return f"INV-{company_id}-{value:06d}"
+
+
+def invoice_year(issue_date=None):
+    """Año de la numeración: el de la fecha de emisión en la zona horaria de reportes."""
+    from .rollups import reporting_timezone
+    return timezone.localdate(issue_date or timezone.now(), reporting_timezone()).year
+
+
+def next_invoice_number(company_id, issue_date=None):
+    """Número de factura consecutivo por empresa y año de emisión (AAAA-NNNN)."""
+    year = invoice_year(issue_date)
+    return format_invoice_number(year, next_value(company_id, 'INVOICE', year))
+
+
+def next_internal_id(company_id):
+    """ID interno consecutivo por empresa (INV-<empresa>-NNNNNN)."""
+    return format_internal_id(company_id, next_value(company_id, 'INTERNAL'))
@@ -1,8 +1,17 @@
+from decimal import Decimal
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Invoice, InvoiceItem
+from django.db import transaction
+from django.utils import timezone
+from .models import Invoice, InvoiceItem, InvoiceJob
+from .jobs import enqueue_invoice_email
+from .sequences import format_internal_id, format_invoice_number, invoice_year, reserve
+from .totals import deferred_totals
+from .rollups import record_invoices
 from marketplace.models import Product, Company
 from marketplace.serializers import ProductSerializer
+from marketplace.tenancy import owns_company
 
 CustomerUser = get_user_model()
 
@@ -28,9 +37,24 @@ class CustomerUserSerializer(serializers.ModelSerializer):
 
 class CustomerLookupSerializer(serializers.Serializer):
     search_term = serializers.CharField()
+    company_id = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(required=False, default=5, min_value=1, max_value=20)
+
+def get_expanded_fields(context):
+    """Relaciones pedidas con `?expand=campo1,campo2`."""
+    request = context.get('request')
+    if request is None:
+        return set()
+    return {
+        field.strip()
+        for field in request.query_params.get('expand', '').split(',')
+        if field.strip()
+    }
+
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    # Copia ligera del producto; el producto completo se pide con ?expand=product
+    product = serializers.SerializerMethodField()
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(),
         source='product',
@@ -42,6 +66,15 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'product', 'product_id', 'quantity', 'unit_price', 'total', 'description']
         read_only_fields = ['total']
 
+    def get_product(self, obj):
+        if 'product' in get_expanded_fields(self.context):
+            return ProductSerializer(obj.product, context=self.context).data
+        return {
+            'id': obj.product_id,
+            'name': obj.product_name,
+            'price': str(obj.product_price) if obj.product_price is not None else None
+        }
+
     def validate(self, data):
         if data.get('quantity', 0) <= 0:
             raise serializers.ValidationError("La cantidad debe ser mayor a cero")
@@ -74,24 +107,220 @@ class InvoiceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['subtotal', 'total', 'invoice_number', 'internal_id']
 
+    def validate_company_id(self, company):
+        request = self.context.get('request')
+        if request is not None and not owns_company(request, company.pk):
+            raise serializers.ValidationError("Empresa no válida")
+        return company
+
     def create(self, validated_data):
         invoice_items_data = validated_data.pop('invoice_items')
 
-        # Generar ID interno
+        # Generar número de factura e ID interno desde la secuencia de la empresa
         company = validated_data['company']
-        internal_id = Invoice.generate_internal_id(company.id)
-        validated_data['internal_id'] = internal_id
+        validated_data['invoice_number'] = Invoice.generate_invoice_number(
+            company.id, validated_data.get('issue_date')
+        )
+        validated_data['internal_id'] = Invoice.generate_internal_id(company.id)
 
         invoice = Invoice.objects.create(**validated_data)
 
-        for item_data in invoice_items_data:
-            product = item_data.pop('product')
-            InvoiceItem.objects.create(invoice=invoice, product=product, **item_data)
+        # Los totales se calculan una sola vez al terminar de crear los ítems
+        with deferred_totals():
+            for item_data in invoice_items_data:
+                product = item_data.pop('product')
+                InvoiceItem.objects.create(invoice=invoice, product=product, **item_data)
+        invoice.refresh_from_db(fields=['subtotal', 'total', 'updated_at'])
 
-        invoice.calculate_totals()
-        invoice.send_invoice_email()
+        # El email y el PDF se entregan en segundo plano al confirmar la transacción
+        enqueue_invoice_email(invoice)
         return invoice
-    
+
+
+class BulkInvoiceItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+    def validate(self, data):
+        if data['quantity'] <= 0:
+            raise serializers.ValidationError("La cantidad debe ser mayor a cero")
+        if data['unit_price'] <= 0:
+            raise serializers.ValidationError("El precio unitario debe ser mayor a cero")
+        return data
+
+
+class BulkInvoiceSerializer(serializers.Serializer):
+    company_id = serializers.IntegerField()
+    customer_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Invoice.INVOICE_STATUS, default='BORRADOR')
+    issue_date = serializers.DateTimeField(required=False)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    invoice_items = BulkInvoiceItemSerializer(many=True, allow_empty=False)
+
+
+class InvoiceBulkCreateSerializer(serializers.Serializer):
+    """
+    Creación masiva de facturas.
+
+    Las empresas, clientes y productos referenciados se resuelven con una
+    consulta por modelo, los números se reservan en bloque por empresa (y año
+    de emisión, como en la creación individual) y las facturas e ítems se
+    insertan con `bulk_create`, calculando los totales en memoria.
+
+    Los números se reservan antes de la transacción de las inserciones y se
+    confirman de inmediato (`reserve`): la fila de la secuencia no queda
+    bloqueada mientras se insertan hasta INVOICE_BULK_MAX_SIZE facturas, a
+    costa de dejar huecos en la numeración si las inserciones fallan.
+    """
+    invoices = BulkInvoiceSerializer(many=True, allow_empty=False)
+    send_emails = serializers.BooleanField(default=False)
+
+    def validate_invoices(self, invoices):
+        max_size = getattr(settings, 'INVOICE_BULK_MAX_SIZE', 5000)
+        if len(invoices) > max_size:
+            raise serializers.ValidationError(f"Máximo {max_size} facturas por petición")
+
+        request = self.context['request']
+        owned_company_ids = {
+            company_id for company_id in {data['company_id'] for data in invoices}
+            if owns_company(request, company_id)
+        }
+        customer_ids = {data['customer_id'] for data in invoices}
+        product_ids = {
+            item['product_id']
+            for data in invoices
+            for item in data['invoice_items']
+        }
+
+        customers = CustomerUser.objects.in_bulk(customer_ids)
+        products = Product.objects.only('id', 'name', 'price').in_bulk(product_ids)
+        # Se reutilizan en create() para copiar nombre y precio en los ítems
+        self.products = products
+
+        errors = []
+        for data in invoices:
+            invoice_errors = {}
+            if data['company_id'] not in owned_company_ids:
+                invoice_errors['company_id'] = ["Empresa no válida"]
+            if data['customer_id'] not in customers:
+                invoice_errors['customer_id'] = ["Cliente no válido"]
+            missing = sorted({
+                item['product_id'] for item in data['invoice_items']
+                if item['product_id'] not in products
+            })
+            if missing:
+                invoice_errors['invoice_items'] = [f"Productos no válidos: {missing}"]
+            errors.append(invoice_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return invoices
+
+    def create(self, validated_data):
+        invoices_data = validated_data['invoices']
+        now = timezone.now()
+
+        # Reservar con una sola llamada los números de cada empresa y año de
+        # emisión, y los IDs internos de cada empresa
+        number_counts = {}
+        internal_counts = {}
+        for data in invoices_data:
+            data['issue_date'] = data.get('issue_date') or now
+            key = (data['company_id'], invoice_year(data['issue_date']))
+            number_counts[key] = number_counts.get(key, 0) + 1
+            internal_counts[data['company_id']] = internal_counts.get(data['company_id'], 0) + 1
+        numbers = {
+            (company_id, year): reserve(company_id, 'INVOICE', year, count)[0]
+            for (company_id, year), count in number_counts.items()
+        }
+        internal_ids = {
+            company_id: reserve(company_id, 'INTERNAL', 0, count)[0]
+            for company_id, count in internal_counts.items()
+        }
+
+        with transaction.atomic():
+            return self._insert(invoices_data, numbers, internal_ids, validated_data['send_emails'])
+
+    def _insert(self, invoices_data, numbers, internal_ids, send_emails):
+        """Inserta las facturas, sus ítems y trabajos con los números ya reservados."""
+        cent = Decimal('0.01')
+        invoices = []
+        items_per_invoice = []
+        for data in invoices_data:
+            company_id = data['company_id']
+            year = invoice_year(data['issue_date'])
+            items = [
+                InvoiceItem(
+                    product_id=item['product_id'],
+                    product_name=self.products[item['product_id']].name,
+                    product_price=self.products[item['product_id']].price,
+                    quantity=item['quantity'],
+                    unit_price=item['unit_price'],
+                    total=(item['quantity'] * item['unit_price']).quantize(cent),
+                    description=item.get('description')
+                )
+                for item in data['invoice_items']
+            ]
+            subtotal = sum((item.total for item in items), Decimal('0'))
+
+            invoices.append(Invoice(
+                company_id=company_id,
+                customer_id=data['customer_id'],
+                invoice_number=format_invoice_number(year, numbers[(company_id, year)]),
+                internal_id=format_internal_id(company_id, internal_ids[company_id]),
+                status=data['status'],
+                issue_date=data['issue_date'],
+                due_date=data.get('due_date'),
+                notes=data.get('notes'),
+                subtotal=subtotal,
+                total=subtotal
+            ))
+            items_per_invoice.append(items)
+            numbers[(company_id, year)] += 1
+            internal_ids[company_id] += 1
+
+        batch_size = getattr(settings, 'INVOICE_BULK_BATCH_SIZE', 500)
+        Invoice.objects.bulk_create(invoices, batch_size=batch_size)
+
+        all_items = []
+        for invoice, items in zip(invoices, items_per_invoice):
+            for item in items:
+                item.invoice = invoice
+            all_items.extend(items)
+        InvoiceItem.objects.bulk_create(all_items, batch_size=batch_size)
+        record_invoices(invoices)
+
+        if send_emails:
+            InvoiceJob.objects.bulk_create([
+                InvoiceJob(
+                    invoice=invoice,
+                    job_type='SEND_EMAIL',
+                    max_attempts=getattr(settings, 'INVOICE_JOB_MAX_ATTEMPTS', 5)
+                )
+                for invoice in invoices
+                if invoice.status == 'EMITIDA'
+            ], batch_size=batch_size)
+
+        return invoices
+
+    def to_representation(self, invoices):
+        return {
+            'created': len(invoices),
+            'invoices': [
+                {
+                    'id': invoice.id,
+                    'invoice_number': invoice.invoice_number,
+                    'internal_id': invoice.internal_id,
+                    'total': str(invoice.total)
+                }
+                for invoice in invoices
+            ]
+        }
+
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(style={'input_type': 'password'})
\ No newline at end of file
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication
+from .models import CustomerUser
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    authentication.forget_token(instance.key)
+
+
+@receiver(post_save, sender=CustomerUser)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # El inicio de sesión solo actualiza last_login: no cambia la autenticación
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    authentication.forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=CustomerUser)
+def user_deleted(sender, instance, **kwargs):
+    authentication.forget_user(instance.pk)
@@ -1,3 +1,422 @@
-from django.test import TestCase
+import csv
+import io
+import socket
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from backend import mail
+from backend.smtp_server import LocalSMTPServer
+
+from marketplace.models import Category, Company, Product
+
+from . import authentication
+from .management.commands.check_query_plans import explain_hot_queries
+from .models import CustomerUser, Invoice, InvoiceItem
+
+
+def create_invoices(company, customer, products, count):
+    """Facturas con un ítem por producto."""
+    invoices = []
+    for _ in range(count):
+        invoice = Invoice.objects.create(
+            company=company,
+            customer=customer,
+            invoice_number=Invoice.generate_invoice_number(company.id),
+            internal_id=Invoice.generate_internal_id(company.id)
+        )
+        for product in products:
+            InvoiceItem.objects.create(
+                invoice=invoice,
+                product=product,
+                quantity=Decimal('2'),
+                unit_price=product.price,
+                total=product.price * 2
+            )
+        invoices.append(invoice)
+    return invoices
+
+
+class InvoiceAPITestCase(TestCase):
+    """Empresa con productos y un cliente, y un cliente de la API autenticado como su dueño."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomerUser.objects.create_user('owner@example.com', 'secret')
+        cls.customer = CustomerUser.objects.create_user(
+            'cliente@example.com', 'secret', first_name='Ana', last_name='Gómez'
+        )
+        cls.company = Company.objects.create(
+            user=cls.owner, name='Tienda', description='Tienda', phone='3000000000', address='Calle 1'
+        )
+        category = Category.objects.create(name='General')
+        cls.products = []
+        for index in range(3):
+            product = Product.objects.create(
+                company=cls.company, name=f'Producto {index}', description='Producto', price=Decimal('1000.00')
+            )
+            product.categories.add(category)
+            cls.products.append(product)
+
+    def setUp(self):
+        # Las empresas del usuario se cachean (marketplace.tenancy): cada
+        # prueba parte del caché vacío para contar siempre las mismas consultas
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+
+class InvoiceQueryCountTests(InvoiceAPITestCase):
+    """
+    El listado y el detalle de facturas cargan sus relaciones en un número
+    fijo de consultas (ver InvoiceViewSet.optimize_queryset), sin importar
+    cuántas facturas, ítems o productos devuelvan.
+    """
+
+    def assert_list_queries(self, expected, **params):
+        with self.assertNumQueries(expected):
+            response = self.client.get('/api/invoicing/invoices/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count_is_constant(self):
+        create_invoices(self.company, self.customer, self.products, 1)
+        response = self.assert_list_queries(3)
+        self.assertEqual(len(response.data['results']), 1)
+
+        cache.clear()
+        create_invoices(self.company, self.customer, self.products, 19)
+        response = self.assert_list_queries(3)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(response.data['results'][0]['invoice_items']), 3)
+
+    def test_list_with_expanded_products_query_count_is_constant(self):
+        create_invoices(self.company, self.customer, self.products, 1)
+        self.assert_list_queries(4, expand='product')
+
+        cache.clear()
+        create_invoices(self.company, self.customer, self.products, 19)
+        response = self.assert_list_queries(4, expand='product')
+        item = response.data['results'][0]['invoice_items'][0]
+        self.assertIn('categories', item['product'])
+
+    def test_retrieve_query_count(self):
+        invoice, = create_invoices(self.company, self.customer, self.products, 1)
+        url = f'/api/invoicing/invoices/{invoice.pk}/'
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['invoice_items']), 3)
+
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'expand': 'product'})
+        self.assertEqual(response.data['invoice_items'][0]['product']['name'], 'Producto 0')
+
+
+class InvoiceConditionalGetTests(InvoiceAPITestCase):
+    """ETag del listado y del detalle de facturas (ver ConditionalGetMixin)."""
+
+    def revalidate(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_list_is_validated_with_the_served_page(self):
+        invoice, = create_invoices(self.company, self.customer, self.products, 1)
+        url = '/api/invoicing/invoices/'
+        response = self.client.get(url)
+
+        # La página y sus ítems (las empresas del usuario ya están en caché)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        invoice.notes = 'Actualizada'
+        invoice.save()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_retrieve_etag_changes_with_customer(self):
+        invoice, = create_invoices(self.company, self.customer, self.products, 1)
+        url = f'/api/invoicing/invoices/{invoice.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        CustomerUser.objects.filter(pk=self.customer.pk).update(first_name='Ana María')
+        response = self.revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['customer_details']['first_name'], 'Ana María')
+
+    def test_retrieve_etag_changes_with_expanded_product(self):
+        invoice, = create_invoices(self.company, self.customer, self.products, 1)
+        url = f'/api/invoicing/invoices/{invoice.pk}/'
+        response = self.client.get(url, {'expand': 'product'})
+
+        self.products[0].description = 'Otra descripción'
+        self.products[0].save()
+        self.assertEqual(self.revalidate(url, response, expand='product').status_code, 200)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Con el token en caché la autenticación no consulta la base de datos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomerUser.objects.create_user('owner@example.com', 'secret', first_name='Ana')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        authentication._local.clear()
+        self.backend = authentication.CachedTokenAuthentication()
+
+    def test_cached_token_authenticates_without_queries(self):
+        self.backend.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.backend.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, user.is_active, user.is_staff), (self.user.pk, True, False))
+        self.assertEqual(token.key, self.token.key)
+        self.assertNotIn('password', user.__dict__)
+
+        # Los campos no cacheados se cargan al usarlos
+        with self.assertNumQueries(1):
+            self.assertEqual(user.first_name, 'Ana')
+
+    def test_deactivating_user_invalidates_cached_token(self):
+        self.backend.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.backend.authenticate_credentials(self.token.key)
+
+    @override_settings(AUTH_SIGNED_TOKENS=True)
+    def test_signed_token_uses_cached_user(self):
+        key = authentication.make_signed_token(self.user)
+        self.backend.authenticate_credentials(key)
+
+        with self.assertNumQueries(0):
+            user, _ = self.backend.authenticate_credentials(key)
+        self.assertEqual(user.pk, self.user.pk)
+
+
+class InvoiceNumberingTests(InvoiceAPITestCase):
+    """Los números de factura siguen la secuencia de la empresa y el año de emisión."""
+
+    def bulk_invoice(self, issue_date):
+        return {
+            'company_id': self.company.pk,
+            'customer_id': self.customer.pk,
+            'issue_date': issue_date,
+            'invoice_items': [{'product_id': self.products[0].pk, 'quantity': '1', 'unit_price': '1000'}],
+        }
+
+    def test_bulk_create_numbers_each_invoice_by_its_issue_year(self):
+        response = self.client.post('/api/invoicing/invoices/bulk/', {
+            'invoices': [
+                self.bulk_invoice('2025-06-01T12:00:00Z'),
+                self.bulk_invoice('2026-03-01T12:00:00Z'),
+                self.bulk_invoice('2025-07-01T12:00:00Z'),
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        numbers = [invoice['invoice_number'] for invoice in response.data['invoices']]
+        self.assertEqual(numbers, ['2025-0001', '2026-0001', '2025-0002'])
+        internal_ids = [invoice['internal_id'] for invoice in response.data['invoices']]
+        self.assertEqual(len(set(internal_ids)), 3)
+
+    def test_single_create_continues_the_issue_year_sequence(self):
+        self.client.post('/api/invoicing/invoices/bulk/', {
+            'invoices': [self.bulk_invoice('2025-06-01T12:00:00Z')]
+        }, format='json')
+
+        response = self.client.post('/api/invoicing/invoices/', {
+            'company_id': self.company.pk,
+            'customer_id': self.customer.pk,
+            'issue_date': '2025-08-01T12:00:00Z',
+            'invoice_items': [{'product_id': self.products[0].pk, 'quantity': '1', 'unit_price': '1000'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['invoice_number'], '2025-0002')
+
+
+class InvoiceSummaryTests(InvoiceAPITestCase):
+    """El resumen por estado sale del acumulado diario."""
+
+    def test_omits_statuses_left_without_invoices(self):
+        invoice, = create_invoices(self.company, self.customer, self.products[:1], 1)
+        invoice.status = 'PAGADA'
+        invoice.save()
+
+        response = self.client.get('/api/invoicing/invoices/summary/', {'company_id': self.company.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['status'] for row in response.data['summary']], ['PAGADA'])
+
+
+class InvoiceCSVExportTests(InvoiceAPITestCase):
+    """La exportación CSV no deja que Excel interprete los textos como fórmulas."""
+
+    def export(self, **params):
+        response = self.client.get('/api/invoicing/invoices/export.csv', params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8').lstrip('\ufeff')
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def test_escapes_values_that_start_like_formulas(self):
+        CustomerUser.objects.filter(pk=self.customer.pk).update(
+            first_name='=HYPERLINK("http://example.com")', last_name='-Gómez'
+        )
+        Product.objects.filter(pk=self.products[0].pk).update(name='@SUM(A1)')
+        create_invoices(self.company, self.customer, [Product.objects.get(pk=self.products[0].pk)], 1)
+
+        row, = self.export()
+        self.assertEqual(row['cliente_nombre'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row['cliente_apellido'], "'-Gómez")
+        self.assertEqual(row['empresa'], 'Tienda')
+        self.assertEqual(row['total'], '2000.00')
+
+        item, = self.export(level='items')
+        self.assertEqual(item['producto'], "'@SUM(A1)")
+
+
+class InvoiceItemSnapshotTests(TestCase):
+    """El ítem guarda una copia del producto; cambiar el producto la renueva."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomerUser.objects.create_user('owner@example.com', 'secret')
+        cls.company = Company.objects.create(
+            user=cls.owner, name='Tienda', description='Tienda', phone='3000000000', address='Calle 1'
+        )
+        cls.coffee = Product.objects.create(
+            company=cls.company, name='Café', description='Café', price=Decimal('1000.00')
+        )
+        cls.tea = Product.objects.create(
+            company=cls.company, name='Té', description='Té', price=Decimal('800.00')
+        )
+
+    def test_changing_product_of_existing_item_updates_snapshot(self):
+        invoice, = create_invoices(self.company, self.owner, [self.coffee], 1)
+        item = InvoiceItem.objects.get(invoice=invoice)
+        item.product_id = self.tea.pk
+        item.save()
+
+        item = InvoiceItem.objects.get(pk=item.pk)
+        self.assertEqual((item.product_name, item.product_price), ('Té', Decimal('800.00')))
+
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.get(f'/api/invoicing/invoices/{invoice.pk}/')
+        product = response.data['invoice_items'][0]['product']
+        self.assertEqual((product['id'], product['name']), (self.tea.pk, 'Té'))
+
+    def test_saving_item_keeps_snapshot_when_product_is_unchanged(self):
+        invoice, = create_invoices(self.company, self.owner, [self.coffee], 1)
+        Product.objects.filter(pk=self.coffee.pk).update(name='Café molido')
+        item = InvoiceItem.objects.get(invoice=invoice)
+        item.quantity = Decimal('3')
+        item.save()
+
+        item.refresh_from_db()
+        self.assertEqual(item.product_name, 'Café')
+
+
+class QueryPlanTests(InvoiceAPITestCase):
+    """Las consultas frecuentes usan sus índices compuestos (ver check_query_plans)."""
+
+    def test_hot_queries_use_their_indexes(self):
+        create_invoices(self.company, self.customer, self.products, 3)
+        # TestCase envuelve cada prueba en una transacción, donde aplica el SET LOCAL de PostgreSQL
+        for name, plan, errors in explain_hot_queries(self.company.pk):
+            with self.subTest(name):
+                self.assertEqual(errors, [], plan)
+
+
+POOL_SETTINGS = {'MAX_SIZE': 4, 'MAX_IDLE': 60, 'CHECK_AFTER': 5, 'MAX_MESSAGES': 100}
+
+
+class PooledEmailBackendTests(SimpleTestCase):
+    """PooledEmailBackend contra un servidor SMTP local (backend.smtp_server)."""
+
+    def setUp(self):
+        self.server = LocalSMTPServer().start()
+        self.settings_override = override_settings(
+            EMAIL_BACKEND='backend.mail.PooledEmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_POOL=POOL_SETTINGS,
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        mail.close_pooled_connections()
+        self.settings_override.disable()
+        self.server.stop()
+
+    def send(self, count=1):
+        for index in range(count):
+            EmailMessage(f'Factura {index}', 'Adjunta', 'ventas@example.com', ['cliente@example.com']).send()
+
+    def pooled_entries(self):
+        return [entry for entries in mail._pool.idle.values() for entry in entries]
+
+    def test_reuses_connection_between_sends(self):
+        self.send(3)
+
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.pooled_entries()), 1)
+
+    def test_checks_idle_connection_with_noop(self):
+        self.send()
+        self.assertNotIn('NOOP', self.server.commands)
+
+        with self.settings(EMAIL_POOL={**POOL_SETTINGS, 'CHECK_AFTER': 0}):
+            self.send()
+
+        self.assertIn('NOOP', self.server.commands)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.messages), 2)
+
+    def test_discards_connection_idle_longer_than_max_idle(self):
+        self.send()
+        with self.settings(EMAIL_POOL={**POOL_SETTINGS, 'MAX_IDLE': 0}):
+            self.send()
+
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(len(self.server.messages), 2)
+
+    def test_rotates_connection_after_max_messages(self):
+        messages = [
+            EmailMessage(f'Factura {index}', 'Adjunta', 'ventas@example.com', ['cliente@example.com'])
+            for index in range(5)
+        ]
+        with self.settings(EMAIL_POOL={**POOL_SETTINGS, 'MAX_MESSAGES': 2}):
+            sent = mail.send_many(messages)
+
+        self.assertEqual(sent, 5)
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 3)
+
+    def test_reconnects_when_connection_was_dropped(self):
+        self.send()
+        entry, = self.pooled_entries()
+        # La conexión se corta sin QUIT; sigue en el pool y pasa la comprobación
+        # (CHECK_AFTER no ha transcurrido), así que el envío debe reconectar
+        entry.connection.sock.shutdown(socket.SHUT_RDWR)
+
+        self.send()
+
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(len(self.pooled_entries()), 1)
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# IDs de facturas con totales pendientes de recalcular dentro de deferred_totals()
+_dirty_invoices = ContextVar('invoicing_dirty_invoices', default=None)
+
+
+def apply_delta(invoice_id, delta):
+    """Suma `delta` al subtotal y total de la factura con un único UPDATE."""
+    from .models import Invoice
+    from .rollups import invoice_day, record
+
+    if not delta:
+        return
+    dirty = _dirty_invoices.get()
+    if dirty is not None:
+        dirty.add(invoice_id)
+        return
+    invoice = Invoice.objects.filter(pk=invoice_id).values_list(
+        'company_id', 'created_at', 'status'
+    ).first()
+    if invoice is None:
+        return
+    Invoice.objects.filter(pk=invoice_id).update(
+        subtotal=F('subtotal') + delta,
+        total=F('total') + delta,
+        updated_at=timezone.now()
+    )
+    company_id, created_at, status = invoice
+    record(company_id, invoice_day(created_at), status, amount=delta)
+
+
+def touch(invoice_id):
+    """Marca la factura como modificada (cambia su ETag) cuando cambian ítems sin afectar totales."""
+    from .models import Invoice
+
+    if _dirty_invoices.get() is not None:
+        return
+    Invoice.objects.filter(pk=invoice_id).update(updated_at=timezone.now())
+
+
+def recalculate(invoice_ids):
+    """Recalcula desde los ítems el subtotal y total de las facturas indicadas."""
+    from .models import Invoice, InvoiceItem
+    from .rollups import invoice_day, record
+
+    invoice_ids = list(invoice_ids)
+    if not invoice_ids:
+        return
+    sums = dict(
+        InvoiceItem.objects.filter(invoice_id__in=invoice_ids)
+        .values('invoice_id')
+        .annotate(items_total=Sum('total'))
+        .values_list('invoice_id', 'items_total')
+    )
+    current = Invoice.objects.filter(pk__in=invoice_ids).values_list(
+        'id', 'company_id', 'created_at', 'status', 'subtotal', 'total'
+    )
+    now = timezone.now()
+    for invoice_id, company_id, created_at, status, old_subtotal, total in current:
+        subtotal = sums.get(invoice_id) or Decimal('0')
+        if subtotal == old_subtotal == total:
+            continue
+        Invoice.objects.filter(pk=invoice_id).update(
+            subtotal=subtotal,
+            total=subtotal,
+            updated_at=now
+        )
+        record(company_id, invoice_day(created_at), status, amount=subtotal - total)
+
+
+@contextmanager
+def deferred_totals():
+    """
+    Difiere el mantenimiento de totales hasta el final del bloque.
+
+    Dentro del bloque las escrituras de ítems solo marcan la factura; al
+    salir se recalcula cada factura marcada una sola vez. Los bloques
+    anidados se integran en el más externo.
+    """
+    if _dirty_invoices.get() is not None:
+        yield
+        return
+
+    dirty = set()
+    token = _dirty_invoices.set(dirty)
+    try:
+        with transaction.atomic():
+            yield
+            _dirty_invoices.reset(token)
+            token = None
+            recalculate(dirty)
+    finally:
+        if token is not None:
+            _dirty_invoices.reset(token)
+
+
+def items_total_expression():
+    """Suma de los totales de los ítems de una factura (0 si no tiene ítems)."""
+    return Coalesce(Sum('invoice_items__total'), Decimal('0'))
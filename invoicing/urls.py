@@ -1,12 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'customers', views.CustomerUserViewSet)
 router.register(r'invoices', views.InvoiceViewSet, basename='invoice')
 
 urlpatterns = [
+    # Sin barra final, para que el cliente reciba un nombre de archivo .csv
+    path(
+        'invoices/export.csv',
+        views.InvoiceViewSet.as_view({'get': 'export_csv'}),
+        name='invoice-export-csv-file'
+    ),
+    # Versiones asíncronas (ver invoicing.async_views), para servir bajo ASGI
+    path('async/invoices/dashboard/', async_views.dashboard, name='invoice-dashboard-async'),
+    path('async/invoices/<int:pk>/generate_pdf/', async_views.generate_pdf, name='invoice-generate-pdf-async'),
+    path('async/customers/lookup/', async_views.customer_lookup, name='customer-lookup-async'),
     path('', include(router.urls)),
     path('login/', views.LoginView.as_view(), name='login'),
 ]
\ No newline at end of file
@@ -2,21 +2,20 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, Count, F, Q
+from django.db.models import Sum, Prefetch
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
 from datetime import datetime, timedelta
-from .models import CustomerUser, Invoice, InvoiceItem
+from .models import CustomerUser, Invoice, InvoiceItem, DailyCompanySales
+from marketplace.tenancy import get_company_ids, owns_company
 from .serializers import CustomerUserSerializer, CustomerLookupSerializer, InvoiceSerializer, InvoiceItemSerializer
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib import colors
 import io
 import logging
 
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import CreatedAtCursorPagination
+
 from rest_framework import status
 from django.utils import timezone
 from django.db import transaction
@@ -24,7 +23,17 @@ from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
-from .serializers import LoginSerializer
+from django.conf import settings
+from .serializers import LoginSerializer, InvoiceBulkCreateSerializer, get_expanded_fields
+from .jobs import enqueue_invoice_email
+from .rollups import reporting_today, sales_trends
+from .dashboard import dashboard_data, parse_sections
+from .pdf import invoice_pdf_data, render_invoice_pdf
+from .pdf_cache import get_invoice_pdf, invoice_pdf_hash
+from .pdf_export import stream_invoice_pdfs_zip
+from .exports import stream_invoice_items_csv, stream_invoices_csv
+from .lookup import lookup_customers
+from .authentication import make_signed_token, remember_token
 
 class LoginView(APIView):
     permission_classes = []  # Permite acceso sin autenticación
@@ -45,11 +54,16 @@ class LoginView(APIView):
             )
             
         token, _ = Token.objects.get_or_create(user=user)
-        
-        return Response({
+        # Las siguientes peticiones con este token se autentican desde el caché
+        remember_token(token)
+
+        data = {
             'token': token.key,
             'user': CustomerUserSerializer(user).data
-        })
+        }
+        if settings.AUTH_SIGNED_TOKENS:
+            data['signed_token'] = make_signed_token(user)
+        return Response(data)
 
 logger = logging.getLogger(__name__)
 
@@ -63,20 +77,27 @@ class CustomerUserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['POST'])
     def lookup(self, request):
-        """Búsqueda de clientes por diferentes campos"""
+        """Búsqueda de clientes por diferentes campos (ver invoicing.lookup)"""
+        serializer = CustomerLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        # Solo se buscan clientes de las empresas del usuario
+        company_ids = get_company_ids(request)
+        company_id = serializer.validated_data.get('company_id')
+        if company_id is not None:
+            company_ids = [company_id] if owns_company(request, company_id) else []
+        if company_id is not None and not company_ids:
+            return Response(
+                {"error": "Empresa no encontrada"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
         try:
-            serializer = CustomerLookupSerializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            search_term = serializer.validated_data['search_term']
-            
-            customers = CustomerUser.objects.filter(
-                Q(email__icontains=search_term) |
-                Q(identification_number__icontains=search_term) |
-                Q(phone_number__icontains=search_term) |
-                Q(first_name__icontains=search_term) |
-                Q(last_name__icontains=search_term)
-            )[:5]
-            
+            customers = lookup_customers(
+                serializer.validated_data['search_term'],
+                company_ids,
+                limit=serializer.validated_data['limit']
+            )
             return Response(CustomerUserSerializer(customers, many=True).data)
         except Exception as e:
             logger.error(f"Error in customer lookup: {str(e)}")
@@ -85,13 +106,14 @@ class CustomerUserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        queryset = Invoice.objects.filter(company__user=self.request.user)
+        queryset = Invoice.objects.filter(company_id__in=get_company_ids(self.request))
         
         # Filtros adicionales
         status = self.request.query_params.get('status', None)
@@ -111,13 +133,59 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         if customer_id:
             queryset = queryset.filter(customer_id=customer_id)
 
+        return self.optimize_queryset(queryset)
+
+    def optimize_queryset(self, queryset):
+        """Carga las relaciones que necesita cada acción en un número fijo de consultas"""
+        if self.action in ('generate_pdf', 'export_pdfs'):
+            return queryset.select_related('customer').prefetch_related(
+                Prefetch('invoice_items', queryset=InvoiceItem.objects.order_by('id'))
+            )
+
+        if self.action in ('list', 'retrieve', 'change_status', 'update', 'partial_update'):
+            items = InvoiceItem.objects.order_by('id')
+            # El producto completo solo se carga si se pide con ?expand=product
+            if 'product' in get_expanded_fields({'request': self.request}):
+                items = items.select_related(
+                    'product', 'product__company'
+                ).prefetch_related('product__categories')
+            return queryset.select_related('company', 'customer').prefetch_related(
+                Prefetch('invoice_items', queryset=items)
+            )
+
         return queryset
 
+    def get_etag_parts(self, invoice):
+        """
+        La respuesta incluye la empresa, el cliente y, con ?expand=product, los
+        productos de los ítems: el ETag cambia también cuando cambian ellos.
+        Los datos del cliente se toman tal cual porque no tiene `updated_at`.
+        """
+        customer = invoice.customer
+        parts = [
+            *super().get_etag_parts(invoice),
+            invoice.company.updated_at.isoformat(),
+            [getattr(customer, field) for field in CustomerUserSerializer.Meta.fields],
+        ]
+        if 'product' in get_expanded_fields({'request': self.request}):
+            for item in invoice.invoice_items.all():
+                product = item.product
+                parts.append([
+                    product.pk,
+                    product.updated_at.isoformat(),
+                    product.company.updated_at.isoformat(),
+                    [(category.pk, category.updated_at.isoformat()) for category in product.categories.all()],
+                ])
+        return parts
+
+    def get_last_modified(self, invoice):
+        # El cliente no tiene fecha de modificación: solo se valida con el ETag
+        return None
+
     def create(self, request, *args, **kwargs):
         try:
             # Iniciar una transacción de base de datos para asegurar atomicidad
             with transaction.atomic():
-                # Generar número de factura único
                 company_id = request.data.get('company_id')
                 
                 # Validar que company_id esté presente
@@ -127,34 +195,9 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                         'detail': 'No se proporcionó un ID de empresa válido'
                     }, status=status.HTTP_400_BAD_REQUEST)
 
-                # Buscar la última factura para esta empresa
-                last_invoice = Invoice.objects.filter(company_id=company_id).order_by('-id').first()
-                
-                # Generar el nuevo número de factura
-                if last_invoice:
-                    last_number = int(last_invoice.invoice_number.split('-')[-1])
-                    new_number = f"{timezone.now().year}-{last_number + 1:04d}"
-                else:
-                    new_number = f"{timezone.now().year}-0001"
-                
-                # Añadir una verificación adicional para evitar números de factura vacíos
-                if not new_number:
-                    raise ValueError("No se pudo generar un número de factura válido")
-                
-                # Verificar y asegurar que el número de factura sea único
-                counter = 1
-                original_new_number = new_number
-                while Invoice.objects.filter(
-                    invoice_number=new_number, 
-                    company_id=company_id
-                ).exists():
-                    new_number = f"{timezone.now().year}-{int(original_new_number.split('-')[-1]) + counter:04d}"
-                    counter += 1
-                
-                # Preparar los datos para la creación de la factura
-                request.data['invoice_number'] = new_number
-                request.data['internal_id'] = Invoice.generate_internal_id(company_id)
-                
+                # El número de factura y el ID interno se asignan desde la
+                # secuencia de la empresa al guardar (ver InvoiceSerializer.create)
+
                 # Crear el serializer y validar los datos
                 serializer = self.get_serializer(data=request.data)
                 serializer.is_valid(raise_exception=True)
@@ -164,21 +207,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 
                 # Devolver la respuesta exitosa
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
-            
-            # Crear los items de la factura
-            items_data = request.data.get('items', [])
-            for item_data in items_data:
-                item_data['invoice'] = serializer.instance.id
-                item_serializer = InvoiceItemSerializer(data=item_data)
-                item_serializer.is_valid(raise_exception=True)
-                item_serializer.save()
-
-            # Recalcular totales
-            serializer.instance.calculate_totals()
-            
-            headers = self.get_success_headers(serializer.data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-        
+
         except Exception as e:
             logger.error(f"Error creating invoice: {str(e)}")
             return Response(
@@ -186,6 +215,26 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request):
+        """Crea muchas facturas con sus ítems en una sola petición"""
+        serializer = InvoiceBulkCreateSerializer(
+            data=request.data,
+            context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            serializer.save()
+        except Exception as e:
+            logger.error(f"Error creating invoices in bulk: {str(e)}")
+            return Response(
+                {"error": "No se pudieron crear las facturas"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['GET'])
     def dashboard(self, request):
         """Dashboard completo para la empresa"""
@@ -196,60 +245,18 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     {"error": "Se requiere company_id"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            if not owns_company(request, company_id):
+                return Response(
+                    {"error": "Empresa no encontrada"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            try:
+                # ?sections=totals,overdue calcula solo lo que el cliente necesita
+                sections = parse_sections(request.query_params.get('sections'))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Estadísticas generales
-            today = timezone.now()
-            month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            
-            total_invoices = Invoice.objects.filter(company_id=company_id).count()
-            total_amount = Invoice.objects.filter(company_id=company_id).aggregate(
-                total=Sum('total')
-            )['total'] or 0
-            
-            monthly_stats = Invoice.objects.filter(
-                company_id=company_id,
-                created_at__gte=month_start
-            ).aggregate(
-                count=Count('id'),
-                total=Sum('total')
-            )
-
-            # Facturas por vencer
-            upcoming_due = Invoice.objects.filter(
-                company_id=company_id,
-                status='EMITIDA',
-                due_date__gte=today,
-                due_date__lte=today + timedelta(days=7)
-            ).count()
-
-            # Facturas vencidas
-            overdue = Invoice.objects.filter(
-                company_id=company_id,
-                status='EMITIDA',
-                due_date__lt=today
-            ).count()
-
-            # Top clientes
-            top_customers = Invoice.objects.filter(company_id=company_id)\
-                .values('customer__first_name', 'customer__last_name')\
-                .annotate(
-                    total_invoices=Count('id'),
-                    total_amount=Sum('total')
-                )\
-                .order_by('-total_amount')[:5]
-
-            response_data = {
-                'total_invoices': total_invoices,
-                'total_amount': total_amount,
-                'monthly_invoices': monthly_stats['count'] or 0,
-                'monthly_amount': monthly_stats['total'] or 0,
-                'upcoming_due': upcoming_due,
-                'overdue': overdue,
-                'top_customers': top_customers,
-                'recent_activity': self.get_recent_activity(company_id)
-            }
-
-            return Response(response_data)
+            return Response(dashboard_data(company_id, sections))
         except Exception as e:
             logger.error(f"Error getting dashboard data: {str(e)}")
             return Response(
@@ -257,16 +264,6 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def get_recent_activity(self, company_id):
-        """Obtiene la actividad reciente de facturación"""
-        recent = Invoice.objects.filter(company_id=company_id)\
-            .order_by('-updated_at')[:10]\
-            .values(
-                'id', 'invoice_number', 'customer__first_name',
-                'customer__last_name', 'total', 'status', 'updated_at'
-            )
-        return recent
-
     @action(detail=True, methods=['POST'])
     def change_status(self, request, pk=None):
         """Cambia el estado de una factura"""
@@ -293,12 +290,13 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            invoice.status = new_status
-            invoice.save()
-            
-            # Enviar email si la factura pasa a estado EMITIDA
-            if new_status == 'EMITIDA':
-                invoice.send_invoice_email()
+            with transaction.atomic():
+                invoice.status = new_status
+                invoice.save()
+
+                # Encolar el email si la factura pasa a estado EMITIDA
+                if new_status == 'EMITIDA':
+                    enqueue_invoice_email(invoice)
             
             return Response(self.get_serializer(invoice).data)
         except Exception as e:
@@ -313,12 +311,22 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         """Genera un PDF de la factura"""
         try:
             invoice = self.get_object()
-            buffer = self.generate_pdf_file(invoice)
+
+            # El hash del contenido sirve de ETag y de clave del caché de PDFs
+            content_hash = invoice_pdf_hash(invoice)
+            etag = f'"{content_hash}"'
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            pdf = get_invoice_pdf(invoice, content_hash)
             
             # Preparar la respuesta
-            buffer.seek(0)
-            response = HttpResponse(buffer, content_type='application/pdf')
+            response = HttpResponse(pdf, content_type='application/pdf')
             response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
             
             return response
         except Exception as e:
@@ -328,70 +336,45 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['GET'])
+    def export_pdfs(self, request):
+        """Descarga un ZIP con los PDF de las facturas del período"""
+        date_from = request.query_params.get('date_from')
+        date_to = request.query_params.get('date_to')
+        if not date_from or not date_to:
+            return Response(
+                {"error": "Se requieren date_from y date_to"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('issue_date', 'id')
+        response = StreamingHttpResponse(
+            stream_invoice_pdfs_zip(queryset),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = f'attachment; filename="facturas_{date_from}_{date_to}.zip"'
+        return response
+
+    @action(detail=False, methods=['GET'], url_path=r'export\.csv', url_name='export-csv')
+    def export_csv(self, request):
+        """Exporta las facturas (o sus ítems con ?level=items) en CSV, en streaming"""
+        invoices = self.filter_queryset(self.get_queryset())
+
+        if request.query_params.get('level') == 'items':
+            rows = stream_invoice_items_csv(invoices)
+            filename = 'facturas_items.csv'
+        else:
+            rows = stream_invoices_csv(invoices)
+            filename = 'facturas.csv'
+
+        response = StreamingHttpResponse(rows, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @staticmethod
     def generate_pdf_file(invoice):
-        """Genera un archivo PDF de la factura"""
-        buffer = io.BytesIO()
-        
-        # Crear el documento PDF
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=letter,
-            rightMargin=inch/2,
-            leftMargin=inch/2,
-            topMargin=inch/2,
-            bottomMargin=inch/2
-        )
-        
-        # Contenido del PDF
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Encabezado
-        elements.append(Paragraph(f"Factura #{invoice.invoice_number}", styles['Title']))
-        elements.append(Paragraph(f"Fecha: {invoice.issue_date.strftime('%d/%m/%Y')}", styles['Normal']))
-        elements.append(Paragraph(f"Cliente: {invoice.customer.get_full_name()}", styles['Normal']))
-        elements.append(Paragraph(f"Email: {invoice.customer.email}", styles['Normal']))
-        
-        # Tabla de items
-        items_data = [['Producto', 'Cantidad', 'Precio Unitario', 'Total']]
-        for item in invoice.invoice_items.all():
-            items_data.append([
-                item.product.name,
-                str(item.quantity),
-                f"${item.unit_price:,.2f}",
-                f"${item.total:,.2f}"
-            ])
-        
-        # Estilo de la tabla
-        table = Table(items_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table)
-        
-        # Totales
-        elements.append(Paragraph(f"Subtotal: ${invoice.subtotal:,.2f}", styles['Normal']))
-        for tax in invoice.taxes.all():
-            elements.append(Paragraph(
-                f"{tax.get_tax_type_display()}: ${tax.amount:,.2f}",
-                styles['Normal']
-            ))
-        elements.append(Paragraph(f"Total: ${invoice.total:,.2f}", styles['Normal']))
-        
-        # Generar PDF
-        doc.build(elements)
-        return buffer
+        """Genera un archivo PDF de la factura (ver invoicing.pdf)"""
+        return io.BytesIO(render_invoice_pdf(invoice_pdf_data(invoice)))
 
     @action(detail=False, methods=['GET'])
     def summary(self, request):
@@ -405,40 +388,40 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     {"error": "Se requiere company_id"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            if not owns_company(request, company_id):
+                return Response(
+                    {"error": "Empresa no encontrada"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             
-            today = timezone.now()
+            today = reporting_today()
             
             if period == 'month':
                 start_date = today - timedelta(days=30)
-                date_trunc = 'day'
+                granularity = 'day'
             elif period == 'quarter':
                 start_date = today - timedelta(days=90)
-                date_trunc = 'week'
+                granularity = 'week'
             else:  # year
                 start_date = today - timedelta(days=365)
-                date_trunc = 'month'
+                granularity = 'month'
             
-            summary = Invoice.objects.filter(
-                company_id=company_id,
-                created_at__gte=start_date
+            daily_sales = DailyCompanySales.objects.filter(company_id=company_id)
+
+            summary = daily_sales.filter(
+                date__range=(start_date, today)
             ).values(
                 'status'
             ).annotate(
-                count=Count('id'),
-                total_amount=Sum('total')
-            )
-            
-            trends = Invoice.objects.filter(
-                company_id=company_id,
-                created_at__gte=start_date
-            ).extra(
-                select={'period': f"date_trunc('{date_trunc}', created_at)"}
-            ).values(
-                'period'
-            ).annotate(
-                count=Count('id'),
-                total_amount=Sum('total')
-            ).order_by('period')
+                count=Sum('invoice_count'),
+                total_amount=Sum('amount')
+            ).filter(
+                # Los cambios de estado dejan filas del acumulado en cero
+                count__gt=0
+            ).order_by('status')
+
+            # Agrupación portable (TruncWeek/TruncMonth) con ceros en los períodos vacíos
+            trends = sales_trends(daily_sales, start_date, today, granularity)
             
             return Response({
                 'summary': summary,
@@ -457,7 +440,7 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         return InvoiceItem.objects.filter(
-            invoice__company__user=self.request.user
+            invoice__company_id__in=get_company_ids(self.request)
         )
 
     def create(self, request, *args, **kwargs):
@@ -465,11 +448,8 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             self.perform_create(serializer)
-            
-            # Recalcular totales de la factura
-            invoice = serializer.instance.invoice
-            invoice.calculate_totals()
-            
+            # Los totales de la factura se actualizan por diferencia al guardar el ítem
+
             headers = self.get_success_headers(serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
         except Exception as e:
@@ -485,11 +465,8 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(instance, data=request.data, partial=True)
             serializer.is_valid(raise_exception=True)
             self.perform_update(serializer)
-            
-            # Recalcular totales de la factura
-            invoice = serializer.instance.invoice
-            invoice.calculate_totals()
-            
+            # Los totales de la factura se actualizan por diferencia al guardar el ítem
+
             return Response(serializer.data)
         except Exception as e:
             logger.error(f"Error updating invoice item: {str(e)}")
@@ -501,12 +478,9 @@ class InvoiceItemViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
-            invoice = instance.invoice
+            # Los totales de la factura se descuentan al eliminar el ítem
             self.perform_destroy(instance)
-            
-            # Recalcular totales de la factura
-            invoice.calculate_totals()
-            
+
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             logger.error(f"Error deleting invoice item: {str(e)}")
@@ -131,6 +131,11 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('name', 'description', 'company__name')
     filter_horizontal = ('categories',)
     readonly_fields = ('show_main_image', 'show_additional_images', 'discounted_price_display')
+    list_select_related = ('company', 'promotion')
+
+    def get_queryset(self, request):
+        # Precio con promoción calculado en SQL para toda la página (sin N+1)
+        return super().get_queryset(request).with_effective_price().prefetch_related('categories')
     
     def show_main_image(self, obj):
         if obj.main_image:
@@ -155,7 +160,7 @@ class ProductAdmin(admin.ModelAdmin):
     show_categories.short_description = "Categorías"
 
     def has_promotion(self, obj):
-        has_active = bool(obj.promotion and obj.promotion.is_active)
+        has_active = bool(obj.promotion and obj.promotion.is_current())
         return format_html(
             '<span style="color: {};">●</span> {}',
             'green' if has_active else 'red',
@@ -165,7 +170,9 @@ class ProductAdmin(admin.ModelAdmin):
 
     def discounted_price_display(self, obj):
         original_price = obj.price
-        discounted_price = obj.get_discounted_price()
+        discounted_price = getattr(obj, 'current_price', None)
+        if discounted_price is None:
+            discounted_price = obj.get_discounted_price()
         
         if original_price != discounted_price:
             return format_html(
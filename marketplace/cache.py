@@ -0,0 +1,183 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.cache import is_process_local
+from backend.conditional import not_modified, set_validators
+
+KEY_PREFIX = 'catalog'
+
+# Alcances de invalidación (ver `bump`)
+CATEGORIES = 'categories'
+CATALOG = 'catalog'
+SEARCH_INDEX = 'search-index'
+
+
+def company_scope(company_id):
+    return f"company:{company_id}"
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    """
+    CATALOG_CACHE_TIMEOUT con un caché compartido (Redis), donde una nueva
+    generación invalida las respuestas de todos los workers. Con un caché por
+    proceso (LocMemCache) cada worker tiene sus propias generaciones y no ve
+    las escrituras de los demás, así que las respuestas se guardan como máximo
+    CATALOG_LOCAL_CACHE_TIMEOUT segundos.
+    """
+    timeout = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+    if is_process_local(get_cache()):
+        return min(timeout, getattr(settings, 'CATALOG_LOCAL_CACHE_TIMEOUT', 5))
+    return timeout
+
+
+def _generation_key(scope):
+    return f"{KEY_PREFIX}:gen:{scope}"
+
+
+def _new_generation():
+    # Basado en el reloj: si el backend descarta el contador, el nuevo valor
+    # no coincide con uno anterior y las respuestas viejas no se reutilizan
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    """Generación actual de cada alcance (crea las que no existen)."""
+    cache = get_cache()
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """
+    Invalida las respuestas en caché que dependen de los alcances indicados,
+    pasando a una nueva generación; las entradas viejas expiran solas.
+
+    Alcances: CATEGORIES (categorías), CATALOG (cualquier empresa o producto,
+    para los listados que mezclan empresas), company_scope(id) (una empresa,
+    sus horarios y sus productos) y SEARCH_INDEX (el índice de búsqueda en
+    memoria de cada worker, ver marketplace.search).
+
+    Returns:
+        list: La nueva generación de cada alcance.
+    """
+    cache = get_cache()
+    generations = []
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            generation = cache.incr(key)
+        except ValueError:
+            generation = _new_generation()
+            cache.set(key, generation, timeout=None)
+        generations.append(generation)
+    return generations
+
+
+def bump_company(company_id):
+    bump(CATALOG, company_scope(company_id))
+
+
+def _product_company_key(product_id):
+    return f"{KEY_PREFIX}:product-company:{product_id}"
+
+
+def get_product_company_id(product_id):
+    """Empresa del producto, para el alcance del detalle sin consultar la base de datos."""
+    from .models import Product
+
+    cache = get_cache()
+    key = _product_company_key(product_id)
+    company_id = cache.get(key)
+    if company_id is None:
+        company_id = Product.objects.filter(pk=product_id).values_list('company_id', flat=True).first()
+        if company_id is not None:
+            cache.set(key, company_id, timeout=None)
+    return company_id
+
+
+def forget_product(product_id):
+    """Descarta la empresa guardada del producto y la devuelve (o None)."""
+    cache = get_cache()
+    key = _product_company_key(product_id)
+    company_id = cache.get(key)
+    cache.delete(key)
+    return company_id
+
+
+class CatalogCacheMixin:
+    """
+    Cachea las respuestas de `list` y `retrieve` de los viewsets del catálogo.
+    Se combina con ConditionalGetMixin: el ETag y Last-Modified se guardan con
+    la respuesta para contestar 304 desde el caché.
+
+    La clave incluye la ruta, los parámetros y la generación de cada alcance
+    del que depende la respuesta (`get_cache_scopes`), así una escritura solo
+    invalida las respuestas afectadas sin borrar claves.
+    """
+
+    def get_cache_scopes(self):
+        raise NotImplementedError
+
+    def _cache_key(self, request, scopes):
+        generations = get_generations(scopes)
+        params = sorted(request.query_params.lists())
+        raw = '|'.join([
+            request.get_host(),
+            request.path,
+            repr(params),
+            request.accepted_renderer.format,
+            repr(generations),
+        ])
+        return f"{KEY_PREFIX}:response:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def _cached(self, handler, request, *args, **kwargs):
+        scopes = self.get_cache_scopes()
+        if scopes is None:
+            return handler(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self._cache_key(request, scopes)
+        cached = cache.get(key)
+        if cached is not None:
+            data, etag, last_modified = cached
+            if etag:
+                return not_modified(request, etag, last_modified) or set_validators(Response(data), etag, last_modified)
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+            cache.set(
+                key,
+                (response.data, response.get('ETag'), last_modified),
+                timeout=_timeout()
+            )
+        return response
+
+    def get_etag_extra(self):
+        # Lo que invalida el caché también cambia el ETag (p. ej. renombrar una
+        # categoría cambia los productos sin modificar su updated_at)
+        extra = super().get_etag_extra()
+        scopes = self.get_cache_scopes()
+        return [*extra, *get_generations(scopes)] if scopes else extra
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
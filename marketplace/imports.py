@@ -0,0 +1,185 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import Category, Product
+from .cache import bump_company
+from .pricing import refresh_effective_prices
+from .search import build_search_document, invalidate_index
+
+REQUIRED_COLUMNS = {'sku', 'name', 'price'}
+# Varias categorías en una misma celda se separan con "|"
+CATEGORY_SEPARATOR = '|'
+
+
+class CategoryResolver:
+    """Resuelve nombres de categoría a IDs con un mapa en memoria cargado una sola vez."""
+
+    def __init__(self, category_type='PRODUCTOS'):
+        self.category_type = category_type
+        self.ids = dict(
+            Category.objects.filter(category_type=category_type).values_list('name', 'id')
+        )
+
+    def resolve(self, names):
+        """IDs de las categorías, creando en un solo INSERT las que no existen."""
+        missing = [name for name in dict.fromkeys(names) if name not in self.ids]
+        if missing:
+            created = Category.objects.bulk_create([
+                Category(name=name, category_type=self.category_type) for name in missing
+            ])
+            for category in created:
+                if category.pk is None:
+                    category = Category.objects.filter(
+                        name=category.name, category_type=self.category_type
+                    ).first()
+                self.ids[category.name] = category.pk
+        return [self.ids[name] for name in names]
+
+
+def parse_row(row):
+    """Valida una fila del CSV. Devuelve (datos, errores)."""
+    errors = []
+    sku = (row.get('sku') or '').strip()
+    name = (row.get('name') or '').strip()
+
+    if not sku:
+        errors.append("sku es obligatorio")
+    elif len(sku) > 64:
+        errors.append("sku admite máximo 64 caracteres")
+    if not name:
+        errors.append("name es obligatorio")
+    elif len(name) > 100:
+        errors.append("name admite máximo 100 caracteres")
+
+    price = None
+    try:
+        price = Decimal((row.get('price') or '').strip())
+        if price <= 0:
+            errors.append("El precio debe ser mayor que 0.")
+        elif price.as_tuple().exponent < -2 or price >= Decimal('1e10'):
+            errors.append("Precio no válido")
+    except InvalidOperation:
+        errors.append("Precio no válido")
+
+    categories = [
+        category.strip()
+        for category in (row.get('category') or '').split(CATEGORY_SEPARATOR)
+        if category.strip()
+    ]
+    if any(len(category) > 50 for category in categories):
+        errors.append("Las categorías admiten máximo 50 caracteres")
+
+    return {
+        'sku': sku,
+        'name': name,
+        'description': (row.get('description') or '').strip(),
+        'price': price,
+        'categories': categories,
+    }, errors
+
+
+def _import_chunk(company, rows, resolver):
+    """Inserta o actualiza un bloque de productos. Devuelve (creados, actualizados)."""
+    # Si el mismo SKU aparece varias veces en el bloque, gana la última fila
+    rows = list({row['sku']: row for row in rows}.values())
+    skus = [row['sku'] for row in rows]
+    existing = set(
+        Product.objects.filter(company=company, sku__in=skus).values_list('sku', flat=True)
+    )
+
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            [
+                Product(
+                    company=company,
+                    sku=row['sku'],
+                    name=row['name'],
+                    description=row['description'],
+                    search_document=build_search_document(row['name'], row['description']),
+                    price=row['price']
+                )
+                for row in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['company', 'sku'],
+            # updated_at (auto_now) se actualiza solo si se incluye aquí
+            update_fields=['name', 'description', 'search_document', 'price', 'updated_at']
+        )
+
+        product_ids = dict(
+            Product.objects.filter(company=company, sku__in=skus).values_list('sku', 'id')
+        )
+        Through = Product.categories.through
+        links = [
+            Through(product_id=product_ids[row['sku']], category_id=category_id)
+            for row in rows
+            for category_id in resolver.resolve(row['categories'])
+        ]
+        Through.objects.bulk_create(links, ignore_conflicts=True)
+
+    created = len(set(skus) - existing)
+    return created, len(skus) - created
+
+
+def import_products_csv(fileobj, company, chunk_size=1000):
+    """
+    Importa productos desde un CSV leyéndolo fila a fila.
+
+    Columnas: sku, name, price (obligatorias), description y category
+    (opcionales; varias categorías separadas por "|"). Los productos se
+    identifican por (empresa, sku): los existentes se actualizan y el resto
+    se crean, en bloques de `chunk_size` filas con `bulk_create`.
+
+    Args:
+        fileobj: Archivo abierto en modo binario o texto.
+        company (Company): Empresa a la que pertenecen los productos.
+        chunk_size (int): Filas por bloque de escritura.
+
+    Returns:
+        dict: {'created', 'updated', 'errors': [{'row', 'errors'}]}
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+    reader = csv.DictReader(fileobj)
+    missing_columns = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+    if missing_columns:
+        return {
+            'created': 0,
+            'updated': 0,
+            'errors': [{'row': 1, 'errors': [f"Faltan columnas: {', '.join(sorted(missing_columns))}"]}]
+        }
+
+    resolver = CategoryResolver()
+    result = {'created': 0, 'updated': 0, 'errors': []}
+    chunk = []
+
+    # La fila 1 es el encabezado
+    for line_number, row in enumerate(reader, start=2):
+        data, errors = parse_row(row)
+        if errors:
+            result['errors'].append({'row': line_number, 'errors': errors})
+            continue
+        chunk.append(data)
+        if len(chunk) >= chunk_size:
+            created, updated = _import_chunk(company, chunk, resolver)
+            result['created'] += created
+            result['updated'] += updated
+            chunk = []
+
+    if chunk:
+        created, updated = _import_chunk(company, chunk, resolver)
+        result['created'] += created
+        result['updated'] += updated
+
+    # bulk_create no pasa por Product.save ni emite señales: se recalcula el
+    # precio efectivo y se invalidan el índice de búsqueda y el caché del catálogo
+    if result['created'] or result['updated']:
+        refresh_effective_prices(Product.objects.filter(company=company))
+        invalidate_index()
+        bump_company(company.pk)
+
+    return result
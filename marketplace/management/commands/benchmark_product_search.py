@@ -0,0 +1,101 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from marketplace.models import Company, Product
+from marketplace.search import build_search_document, invalidate_index, search_products
+
+WORDS = [
+    'carne', 'carnicería', 'pollo', 'cerdo', 'res', 'lomo', 'costilla', 'chorizo',
+    'arroz', 'fríjol', 'lenteja', 'panadería', 'pan', 'queso', 'leche', 'café',
+    'azúcar', 'jabón', 'limpieza', 'fresco', 'orgánico', 'importado', 'nacional',
+    'kilo', 'libra', 'paquete', 'promoción', 'artesanal', 'congelado', 'tajado',
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la búsqueda de productos con icontains y con el índice de búsqueda '
+        'sobre un catálogo sintético (se descarta al terminar)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company-id', type=int, required=True)
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--queries', nargs='+', default=['carniceria', 'carn', 'pollo tajado', 'cafe organico'])
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company_id'])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company_id']} does not exist")
+
+        try:
+            with transaction.atomic():
+                self.create_products(company, options['products'])
+                self.run(company, options)
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            invalidate_index()
+
+    def create_products(self, company, count):
+        rng = random.Random(0)
+        start = time.perf_counter()
+        batch = []
+        for index in range(count):
+            name = ' '.join(rng.sample(WORDS, 3)).capitalize()
+            description = ' '.join(rng.choices(WORDS, k=12))
+            batch.append(Product(
+                company=company,
+                name=name[:100],
+                description=description,
+                search_document=build_search_document(name, description),
+                price=1000 + index % 50000
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+        invalidate_index()
+        self.stdout.write(f"{count} productos creados en {time.perf_counter() - start:.1f} s")
+
+    def measure(self, build_queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = list(build_queryset().values_list('id', flat=True)[:50])
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2], len(results)
+
+    def run(self, company, options):
+        products = Product.objects.filter(company=company)
+
+        start = time.perf_counter()
+        search_products(products, 'warmup', company_id=company.pk).exists()
+        self.stdout.write(f"Primera búsqueda (incluye carga del índice si aplica): {time.perf_counter() - start:.2f} s")
+
+        for query in options['queries']:
+            icontains, icontains_count = self.measure(
+                lambda: products.filter(Q(name__icontains=query) | Q(description__icontains=query)).order_by('id'),
+                options['repeat']
+            )
+            indexed, indexed_count = self.measure(
+                lambda: search_products(products, query, company_id=company.pk),
+                options['repeat']
+            )
+            self.stdout.write(
+                f"{query!r:>18}: icontains {icontains * 1000:8.1f} ms ({icontains_count} res.), "
+                f"índice {indexed * 1000:8.1f} ms ({indexed_count} res.)"
+            )
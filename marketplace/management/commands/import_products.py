@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from marketplace.imports import import_products_csv
+from marketplace.models import Company
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa productos desde un archivo CSV (sku, name, price, description, category), '
+        'creando o actualizando por SKU'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Ruta del archivo CSV')
+        parser.add_argument('--company-id', type=int, required=True,
+                            help='Empresa a la que pertenecen los productos')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Filas por bloque de escritura')
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(pk=options['company_id'])
+        except Company.DoesNotExist:
+            raise CommandError(f"La empresa {options['company_id']} no existe")
+
+        with open(options['csv_path'], 'rb') as csv_file:
+            result = import_products_csv(csv_file, company, chunk_size=options['chunk_size'])
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(f"Fila {error['row']}: {'; '.join(error['errors'])}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} productos creados, {result['updated']} actualizados, "
+            f"{len(result['errors'])} filas con errores"
+        ))
@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from marketplace.pricing import next_price_change, refresh_effective_prices
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza el precio efectivo materializado de los productos cuando las '
+        'promociones empiezan o terminan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Sigue en ejecución, despertando en el próximo cambio de vigencia')
+        parser.add_argument('--max-sleep', type=float, default=300.0,
+                            help='Segundos máximos de espera entre revisiones en modo --loop')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                updated = refresh_effective_prices()
+                if updated:
+                    self.stdout.write(f"{updated} productos actualizados")
+                if not options['loop']:
+                    break
+                time.sleep(self.seconds_until_next_change(options['max_sleep']))
+        except KeyboardInterrupt:
+            self.stdout.write("Detenido")
+
+    def seconds_until_next_change(self, max_sleep):
+        now = timezone.now()
+        next_change = next_price_change(now)
+        if next_change is None:
+            return max_sleep
+        # La vigencia incluye end_date: se revisa un segundo después del límite
+        wait = (next_change + timedelta(seconds=1) - now).total_seconds()
+        return min(max(wait, 0), max_sleep)
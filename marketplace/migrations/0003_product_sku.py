@@ -0,0 +1,22 @@
+# Generated by Django 5.1 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0002_product_company_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Código del producto en la empresa (clave de la importación CSV)', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('company', 'sku'), name='marketplace_prod_company_sku_uniq'),
+        ),
+    ]
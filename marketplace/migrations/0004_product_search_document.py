@@ -0,0 +1,54 @@
+# Generated by Django 5.1 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+SEARCH_INDEX_NAME = 'marketplace_prod_search_gin'
+
+
+def populate_search_document(apps, schema_editor):
+    from marketplace.search import build_search_document
+
+    Product = apps.get_model('marketplace', 'Product')
+    batch = []
+    for product in Product.objects.only('id', 'name', 'description').iterator(chunk_size=2000):
+        product.search_document = build_search_document(product.name, product.description)
+        batch.append(product)
+        if len(batch) == 2000:
+            Product.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    # Índice GIN de texto completo: solo existe en PostgreSQL. La expresión debe
+    # coincidir con SearchVector('search_document', config='simple').
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX {SEARCH_INDEX_NAME} ON marketplace_product "
+        "USING gin (to_tsvector('simple'::regconfig, COALESCE(search_document, '')))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0003_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+def populate_effective_price(apps, schema_editor):
+    from marketplace.pricing import effective_price_expression
+
+    Product = apps.get_model('marketplace', 'Product')
+    Product.objects.update(effective_price=effective_price_expression())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('marketplace', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['company', 'effective_price'], name='marketplace_prod_company_price'),
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 # models.py
+from decimal import Decimal
+
 from django.db import models
+from django.utils import timezone
 from django.conf import settings  # Cambiado: importamos settings en lugar de User directamente
 from cloudinary.models import CloudinaryField
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -57,6 +60,8 @@ class Company(models.Model):
         help_text="Foto de portada de la compañía"
     )
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.name
 
@@ -68,6 +73,7 @@ class Category(models.Model):
 
     name = models.CharField(max_length=50)
     category_type = models.CharField(max_length=20, choices=CATEGORY_TYPES, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.get_category_type_display() if self.category_type else 'Sin tipo'}"
@@ -94,16 +100,61 @@ class Promotion(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_discount_type_display()})"
 
+    def is_current(self, at=None):
+        """Activa y dentro de su vigencia en `at` (por defecto ahora)."""
+        at = at or timezone.now()
+        return self.is_active and self.start_date <= at <= self.end_date
+
+    def save(self, *args, **kwargs):
+        from .pricing import refresh_effective_prices
+
+        super().save(*args, **kwargs)
+        refresh_effective_prices(self.products.all())
+
+    def delete(self, *args, **kwargs):
+        from .pricing import refresh_effective_prices
+
+        product_ids = list(self.products.values_list('id', flat=True))
+        result = super().delete(*args, **kwargs)
+        refresh_effective_prices(Product.objects.filter(pk__in=product_ids))
+        return result
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_effective_price(self, at=None):
+        """Anota `current_price`: el precio con la promoción vigente, calculado en SQL."""
+        from .pricing import effective_price_expression
+
+        return self.annotate(current_price=effective_price_expression(at))
+
+
 class Product(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     categories = models.ManyToManyField(Category, related_name='products')
     name = models.CharField(max_length=100)
+    sku = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="Código del producto en la empresa (clave de la importación CSV)"
+    )
     description = models.TextField()
+    # Nombre y descripción normalizados (sin tildes ni mayúsculas), ver marketplace.search
+    search_document = models.TextField(blank=True, default='', editable=False)
     price = models.DecimalField(
         max_digits=12, 
         decimal_places=2, 
         help_text="Precio en COP"
     )
+    # Precio con la promoción vigente, materializado para ordenar y filtrar
+    # (lo mantienen save() y el comando refresh_effective_prices)
+    effective_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False
+    )
     promotion = models.ForeignKey(
         Promotion, 
         on_delete=models.SET_NULL, 
@@ -128,8 +179,50 @@ class Product(models.Model):
         help_text="Imágenes adicionales del producto"
     )
 
-    def get_discounted_price(self):
-        if not self.promotion or not self.promotion.is_active:
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listado del catálogo de una empresa ordenado/filtrado por nombre
+            models.Index(fields=['company', 'name'], name='marketplace_prod_company_name'),
+            # Productos de una empresa por fecha de modificación
+            models.Index(fields=['company', 'updated_at'], name='marketplace_prod_company_upd'),
+            # Orden y filtros por precio del catálogo de una empresa
+            models.Index(fields=['company', 'effective_price'], name='marketplace_prod_company_price'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'sku'], name='marketplace_prod_company_sku_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        from .search import build_search_document, index_product
+
+        self.search_document = build_search_document(self.name, self.description)
+        self.effective_price = self.get_discounted_price()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'name', 'description'} & update_fields:
+                update_fields.add('search_document')
+            if {'price', 'promotion'} & update_fields:
+                update_fields.add('effective_price')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        index_product(self)
+
+    def delete(self, *args, **kwargs):
+        from .search import remove_product
+
+        product_id = self.pk
+        result = super().delete(*args, **kwargs)
+        remove_product(product_id)
+        return result
+
+    def get_discounted_price(self, at=None):
+        # En listados usar Product.objects.with_effective_price() o effective_price
+        if not self.promotion or not self.promotion.is_current(at):
             return self.price
             
         if self.promotion.discount_type == 'PERCENTAGE':
@@ -137,7 +230,7 @@ class Product(models.Model):
         else:  # AMOUNT
             discount = self.promotion.discount_value
             
-        return max(self.price - discount, 0)
+        return max(self.price - discount, Decimal('0')).quantize(Decimal('0.01'))
 
     def __str__(self):
         return self.name
\ No newline at end of file
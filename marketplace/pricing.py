@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Round
+from django.utils import timezone
+
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def active_promotion_q(at=None, prefix=''):
+    """Promociones activas y dentro de su vigencia en `at` (por defecto ahora)."""
+    at = at or timezone.now()
+    return Q(**{
+        f'{prefix}is_active': True,
+        f'{prefix}start_date__lte': at,
+        f'{prefix}end_date__gte': at,
+    })
+
+
+def effective_price_expression(at=None):
+    """
+    Precio con la promoción vigente del producto, calculado en SQL.
+
+    El descuento se obtiene con una subconsulta por clave primaria de la
+    promoción (sin JOIN), por lo que la expresión sirve tanto para anotar
+    como para un UPDATE masivo.
+    """
+    from .models import Promotion
+
+    discount = Promotion.objects.filter(
+        active_promotion_q(at),
+        pk=OuterRef('promotion_id')
+    ).annotate(
+        discount=Case(
+            When(discount_type='PERCENTAGE', then=OuterRef('price') * F('discount_value') / Value(100)),
+            default=F('discount_value'),
+            output_field=PRICE_FIELD
+        )
+    ).values('discount')[:1]
+
+    return Round(
+        Greatest(
+            F('price') - Coalesce(Subquery(discount, output_field=PRICE_FIELD), Value(Decimal('0'))),
+            Value(Decimal('0')),
+            output_field=PRICE_FIELD
+        ),
+        2,
+        output_field=PRICE_FIELD
+    )
+
+
+def refresh_effective_prices(queryset=None, at=None):
+    """
+    Materializa `Product.effective_price` en los productos cuyo valor guardado
+    ya no corresponde (promociones que empezaron, terminaron o cambiaron).
+
+    Solo revisa productos con promoción o con un precio efectivo distinto del
+    precio base. Actualiza `updated_at` e invalida el caché del catálogo de
+    las empresas afectadas.
+
+    Returns:
+        int: Productos actualizados.
+    """
+    from .cache import bump_company
+    from .models import Product
+
+    if queryset is None:
+        queryset = Product.objects.all()
+    expression = effective_price_expression(at)
+
+    stale = queryset.filter(
+        Q(promotion__isnull=False) | Q(effective_price__isnull=True) | ~Q(effective_price=F('price'))
+    ).alias(computed_price=expression).filter(
+        Q(effective_price__isnull=True) | ~Q(effective_price=F('computed_price'))
+    )
+    company_ids = list(stale.order_by().values_list('company_id', flat=True).distinct())
+    if not company_ids:
+        return 0
+
+    updated = Product.objects.filter(pk__in=stale.values('pk')).update(
+        effective_price=expression,
+        updated_at=timezone.now()
+    )
+    for company_id in company_ids:
+        bump_company(company_id)
+    return updated
+
+
+def next_price_change(after=None):
+    """Próximo inicio o fin de vigencia de una promoción activa, o None."""
+    from .models import Promotion
+
+    after = after or timezone.now()
+    promotions = Promotion.objects.filter(is_active=True, products__isnull=False)
+    boundaries = [
+        promotions.filter(start_date__gt=after).aggregate(next=Min('start_date'))['next'],
+        promotions.filter(end_date__gt=after).aggregate(next=Min('end_date'))['next'],
+    ]
+    boundaries = [boundary for boundary in boundaries if boundary is not None]
+    return min(boundaries) if boundaries else None
@@ -0,0 +1,272 @@
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat, StrIndex
+from rest_framework.filters import BaseFilterBackend
+
+from backend.cache import is_process_local
+
+from . import cache
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Peso de un término según dónde aparece y cómo coincide con la búsqueda
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+PREFIX_MATCH_FACTOR = 0.5
+
+
+def normalize(text):
+    """Minúsculas y sin tildes: 'Carnicería' -> 'carniceria'."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def build_search_document(name, description):
+    """Texto normalizado que se indexa para la búsqueda (nombre y descripción)."""
+    return ' '.join(tokenize(name) + tokenize(description))
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido en memoria (término -> {producto: peso}) para las bases de
+    datos sin búsqueda de texto completo (SQLite en desarrollo).
+
+    Se carga en la primera búsqueda y se mantiene al guardar o eliminar
+    productos en este proceso; las escrituras masivas lo invalidan con
+    `invalidate_index`.
+
+    Cada worker tiene su propia copia: toda escritura pasa a una nueva
+    generación del alcance SEARCH_INDEX (marketplace.cache) y, antes de
+    responder, el índice se recarga si la generación ya no es la que cargó.
+    Un cambio hecho en este proceso se aplica sin recargar si nadie más cambió
+    la generación entre medias. Con un caché por proceso (LocMemCache) los
+    demás workers no ven la generación, así que el índice además se recarga
+    cada PRODUCT_SEARCH_LOCAL_TTL segundos.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.generation = None
+        self.loaded_at = 0
+        self.postings = defaultdict(dict)
+        self.documents = {}  # product_id -> (company_id, términos)
+        self._vocabulary = None
+
+    def load(self, generation=None):
+        from .models import Product
+
+        rows = Product.objects.values_list('id', 'company_id', 'name', 'search_document')
+        for product_id, company_id, name, search_document in rows.iterator(chunk_size=2000):
+            self._add(product_id, company_id, tokenize(name), search_document.split())
+        self.loaded = True
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+
+    def _reset(self):
+        self.loaded = False
+        self.generation = None
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self._vocabulary = None
+
+    def is_stale(self, generation):
+        """Si otro proceso pudo cambiar los productos desde que se cargó el índice."""
+        if generation != self.generation:
+            return True
+        if is_process_local(cache.get_cache()):
+            ttl = getattr(settings, 'PRODUCT_SEARCH_LOCAL_TTL', 30)
+            return time.monotonic() - self.loaded_at > ttl
+        return False
+
+    def _follows(self, generation):
+        # Solo esta escritura pasó la generación desde la que tiene el índice
+        return self.loaded and self.generation is not None and generation == self.generation + 1
+
+    def _add(self, product_id, company_id, name_tokens, document_tokens):
+        weights = defaultdict(int)
+        for token in document_tokens:
+            weights[token] += DESCRIPTION_WEIGHT
+        for token in name_tokens:
+            # El documento ya incluye el nombre: se completa hasta NAME_WEIGHT
+            weights[token] += NAME_WEIGHT - DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self._vocabulary = None
+            self.postings[token][product_id] = weight
+        self.documents[product_id] = (company_id, tuple(weights))
+
+    def _remove(self, product_id):
+        _, tokens = self.documents.pop(product_id, (None, ()))
+        for token in tokens:
+            postings = self.postings[token]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[token]
+                self._vocabulary = None
+
+    def update(self, product):
+        generation, = cache.bump(cache.SEARCH_INDEX)
+        with self.lock:
+            if not self._follows(generation):
+                self._reset()
+                return
+            self._remove(product.pk)
+            self._add(product.pk, product.company_id, tokenize(product.name), product.search_document.split())
+            self.generation = generation
+
+    def remove(self, product_id):
+        generation, = cache.bump(cache.SEARCH_INDEX)
+        with self.lock:
+            if not self._follows(generation):
+                self._reset()
+                return
+            self._remove(product_id)
+            self.generation = generation
+
+    def clear(self):
+        cache.bump(cache.SEARCH_INDEX)
+        with self.lock:
+            self._reset()
+
+    def _matching_tokens(self, term):
+        """Términos del índice que empiezan por `term` (vocabulario ordenado + bisect)."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            yield token
+
+    def search(self, terms, company_id=None, limit=None):
+        """
+        IDs de los productos que contienen todos los términos (por prefijo),
+        ordenados por relevancia: peso del término × idf, con menos peso para
+        las coincidencias solo por prefijo.
+        """
+        generation, = cache.get_generations([cache.SEARCH_INDEX])
+        with self.lock:
+            if not self.loaded or self.is_stale(generation):
+                self._reset()
+                self.load(generation)
+
+            total = len(self.documents) or 1
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for token in self._matching_tokens(term):
+                    postings = self.postings[token]
+                    idf = math.log(1 + total / len(postings))
+                    factor = 1 if token == term else PREFIX_MATCH_FACTOR
+                    for product_id, weight in postings.items():
+                        term_scores[product_id] += weight * idf * factor
+
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        product_id: score + term_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in term_scores
+                    }
+                if not scores:
+                    return []
+
+            if company_id is not None:
+                scores = {
+                    product_id: score
+                    for product_id, score in scores.items()
+                    if self.documents[product_id][0] == company_id
+                }
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [product_id for product_id, _ in ranked[:limit]]
+
+
+_index = ProductSearchIndex()
+
+
+def get_index():
+    return _index
+
+
+def index_product(product):
+    _index.update(product)
+
+
+def remove_product(product_id):
+    _index.remove(product_id)
+
+
+def invalidate_index():
+    """Descarta el índice en memoria, en todos los workers; se reconstruye en la siguiente búsqueda."""
+    _index.clear()
+
+
+def _search_postgresql(queryset, terms):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    # La misma expresión que el índice GIN marketplace_prod_search_gin
+    vector = SearchVector('search_document', config='simple')
+    query = SearchQuery(' & '.join(f"{term}:*" for term in terms), config='simple', search_type='raw')
+    return queryset.annotate(
+        search_vector=vector,
+        search_rank=SearchRank(vector, query)
+    ).filter(search_vector=query).order_by('-search_rank', 'id')
+
+
+def _search_in_memory(queryset, terms, company_id=None):
+    limit = getattr(settings, 'PRODUCT_SEARCH_MAX_RESULTS', 1000)
+    product_ids = _index.search(terms, company_id=company_id, limit=limit)
+    if not product_ids:
+        return queryset.none()
+
+    # Posición del id en ",id1,id2,...": una sola expresión en lugar de un CASE por resultado
+    ranked_ids = Value(',' + ','.join(map(str, product_ids)) + ',')
+    position = StrIndex(ranked_ids, Concat(Value(','), Cast('pk', CharField()), Value(',')))
+    return queryset.filter(pk__in=product_ids).annotate(search_position=position).order_by('search_position')
+
+
+def search_products(queryset, query, company_id=None):
+    """
+    Filtra `queryset` por los productos que coinciden con `query`, ordenados
+    por relevancia. Sin distinguir mayúsculas ni tildes; cada palabra se busca
+    como prefijo ("carn" encuentra "Carnicería").
+
+    En PostgreSQL usa el índice GIN sobre `search_document`; en otras bases de
+    datos, el índice invertido en memoria (limitado a PRODUCT_SEARCH_MAX_RESULTS
+    resultados). `company_id` permite al índice en memoria descartar antes los
+    productos de otras empresas.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset
+    if connections[queryset.db].vendor == 'postgresql':
+        return _search_postgresql(queryset, terms)
+    return _search_in_memory(queryset, terms, company_id)
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """Reemplaza a SearchFilter (`?search=`) usando el índice de búsqueda de productos."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        company = request.query_params.get('company', '')
+        company_id = int(company) if company.isdigit() else None
+        return search_products(queryset, query, company_id=company_id)
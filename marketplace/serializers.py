@@ -81,6 +81,7 @@ class ProductWriteSerializer(serializers.ModelSerializer):
             'categories',
             'category_name',
             'name',
+            'sku',
             'description',
             'price',
             'main_image',
@@ -88,7 +89,8 @@ class ProductWriteSerializer(serializers.ModelSerializer):
         ]
         extra_kwargs = {
             'description': {'required': False},
-            'categories': {'required': False}
+            'categories': {'required': False},
+            'sku': {'required': False}
         }
 
     def validate_price(self, value):
@@ -96,6 +98,10 @@ class ProductWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("El precio debe ser mayor que 0.")
         return value
 
+    def validate_sku(self, value):
+        # Un SKU vacío equivale a no tener SKU (no participa en la restricción única)
+        return value.strip() or None if value else None
+
     def create(self, validated_data):
         # Handle category creation if category_name is provided
         category_name = validated_data.pop('category_name', None)
@@ -123,8 +129,10 @@ class ProductSerializer(serializers.ModelSerializer):
             'company_name',
             'categories',
             'name',
+            'sku',
             'description',
             'price',
+            'effective_price',
             'main_image_url',
             'additional_images_url'
         ]
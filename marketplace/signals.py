@@ -0,0 +1,60 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, tenancy
+from .models import BusinessHours, Category, Company, Product
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_changed(sender, instance, **kwargs):
+    cache.bump(cache.CATEGORIES)
+
+
+@receiver([post_save, post_delete], sender=Company)
+def company_changed(sender, instance, **kwargs):
+    cache.bump_company(instance.pk)
+    tenancy.forget_user_companies(instance.user_id)
+    previous_user_id = getattr(instance, '_previous_user_id', None)
+    if previous_user_id not in (None, instance.user_id):
+        tenancy.forget_user_companies(previous_user_id)
+
+
+@receiver(pre_save, sender=Company)
+def company_saving(sender, instance, **kwargs):
+    # La empresa puede cambiar de dueño: se invalidan las empresas de ambos
+    if instance.pk:
+        instance._previous_user_id = Company.objects.filter(pk=instance.pk).values_list(
+            'user_id', flat=True
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=BusinessHours)
+def business_hours_changed(sender, instance, **kwargs):
+    cache.bump_company(instance.company_id)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    # El producto pudo cambiar de empresa: se invalidan ambas
+    previous_company_id = cache.forget_product(instance.pk)
+    cache.bump_company(instance.company_id)
+    if previous_company_id not in (None, instance.company_id):
+        cache.bump(cache.company_scope(previous_company_id))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    cache.forget_product(instance.pk)
+    cache.bump_company(instance.company_id)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_categories_changed(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Product):
+        cache.bump_company(instance.company_id)
+    else:
+        # Cambios desde la categoría: empresas de los productos afectados
+        company_ids = Product.objects.filter(pk__in=pk_set or ()).values_list('company_id', flat=True).distinct()
+        cache.bump(cache.CATALOG, *[cache.company_scope(company_id) for company_id in company_ids])
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+
+from backend.cache import is_process_local
+
+# Atributo de la petición donde se memoriza el resultado
+REQUEST_ATTRIBUTE = '_tenant_company_ids'
+
+
+def _cache():
+    return caches[getattr(settings, 'TENANT_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    """
+    TENANT_CACHE_TIMEOUT con un caché compartido (Redis), donde guardar o
+    eliminar una empresa invalida la entrada para todos los workers. Con un
+    caché por proceso (LocMemCache) la invalidación solo llega al worker que
+    guardó la empresa, así que se limita a TENANT_LOCAL_CACHE_TIMEOUT segundos.
+    """
+    timeout = getattr(settings, 'TENANT_CACHE_TIMEOUT', 3600)
+    if is_process_local(_cache()):
+        return min(timeout, getattr(settings, 'TENANT_LOCAL_CACHE_TIMEOUT', 5))
+    return timeout
+
+
+def _cache_key(user_id):
+    return f"tenancy:companies:{user_id}"
+
+
+def get_user_company_ids(user):
+    """IDs de las empresas del usuario, desde el caché o con una sola consulta."""
+    from .models import Company
+
+    if not user or not user.is_authenticated:
+        return ()
+    key = _cache_key(user.pk)
+    company_ids = _cache().get(key)
+    if company_ids is None:
+        company_ids = tuple(Company.objects.filter(user_id=user.pk).order_by('id').values_list('id', flat=True))
+        _cache().set(key, company_ids, timeout=_timeout())
+    return company_ids
+
+
+async def aget_user_company_ids(user):
+    """Versión asíncrona de `get_user_company_ids`."""
+    from .models import Company
+
+    if not user or not user.is_authenticated:
+        return ()
+    key = _cache_key(user.pk)
+    company_ids = await _cache().aget(key)
+    if company_ids is None:
+        company_ids = tuple([
+            company_id async for company_id in
+            Company.objects.filter(user_id=user.pk).order_by('id').values_list('id', flat=True)
+        ])
+        await _cache().aset(key, company_ids, timeout=_timeout())
+    return company_ids
+
+
+def forget_user_companies(user_id):
+    """Invalida las empresas en caché del usuario (al crear, reasignar o eliminar una empresa)."""
+    _cache().delete(_cache_key(user_id))
+
+
+def get_company_ids(request):
+    """
+    Empresas del usuario autenticado en la petición, resueltas una sola vez.
+
+    Acepta tanto la petición de Django como la de DRF. Se usa para los filtros
+    por empresa (`company_id__in=...`) en lugar de unir con Company por
+    `company__user`.
+    """
+    request = getattr(request, '_request', request)
+    company_ids = getattr(request, REQUEST_ATTRIBUTE, None)
+    if company_ids is None:
+        company_ids = get_user_company_ids(request.user)
+        setattr(request, REQUEST_ATTRIBUTE, company_ids)
+    return company_ids
+
+
+def owns_company(request, company_id):
+    """
+    Si la empresa es del usuario de la petición. Si no está entre las IDs en
+    caché se consulta de nuevo la base de datos (p. ej. una empresa recién
+    creada que este worker aún no ve).
+    """
+    try:
+        company_id = int(company_id)
+    except (TypeError, ValueError):
+        return False
+    if company_id in get_company_ids(request):
+        return True
+    request = getattr(request, '_request', request)
+    forget_user_companies(request.user.pk)
+    setattr(request, REQUEST_ATTRIBUTE, None)
+    return company_id in get_company_ids(request)
+
+
+async def aget_company_ids(request):
+    """Versión asíncrona de `get_company_ids`, para las vistas asíncronas."""
+    request = getattr(request, '_request', request)
+    company_ids = getattr(request, REQUEST_ATTRIBUTE, None)
+    if company_ids is None:
+        company_ids = await aget_user_company_ids(request.user)
+        setattr(request, REQUEST_ATTRIBUTE, company_ids)
+    return company_ids
+
+
+async def aowns_company(request, company_id):
+    """Versión asíncrona de `owns_company`."""
+    try:
+        company_id = int(company_id)
+    except (TypeError, ValueError):
+        return False
+    if company_id in await aget_company_ids(request):
+        return True
+    await _cache().adelete(_cache_key(request.user.pk))
+    setattr(request, REQUEST_ATTRIBUTE, None)
+    return company_id in await aget_company_ids(request)
+
+
+class TenantMiddleware:
+    """
+    Expone `request.company_ids` (perezoso): las empresas del usuario.
+
+    Se evalúa al primer acceso, después de que DRF autentique la petición por
+    token (DRF asigna el usuario también a la petición de Django).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.company_ids = SimpleLazyObject(lambda: get_company_ids(request))
+        return self.get_response(request)
@@ -1,4 +1,6 @@
 # views.py
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.decorators import action
@@ -7,29 +9,46 @@ from django.db.models import Q
 from .models import Company, Category, Product
 from .serializers import CompanySerializer, CategorySerializer, ProductSerializer
 from rest_framework import viewsets, filters, status
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import ValidationError
 from django.db.models import Q
 from .models import Company, Category, Product
 from .serializers import ProductSerializer, ProductWriteSerializer
+from .imports import import_products_csv
+from .search import ProductSearchFilter
+from . import cache
+from .cache import CatalogCacheMixin
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import SearchResultsPagination
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class CompanyViewSet(viewsets.ModelViewSet):
+    def get_cache_scopes(self):
+        return [cache.CATEGORIES]
+
+class CompanyViewSet(CatalogCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description', 'nit']
 
+    def get_cache_scopes(self):
+        if self.action == 'retrieve':
+            return [cache.company_scope(self.kwargs['pk'])]
+        if self.request.query_params.get('category'):
+            return [cache.CATALOG, cache.CATEGORIES]
+        return [cache.CATALOG]
+
     def get_queryset(self):
         queryset = Company.objects.all()
         category = self.request.query_params.get('category', None)
@@ -42,13 +61,40 @@ class CompanyViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CatalogCacheMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name', 'description']
+    filter_backends = [ProductSearchFilter]
     parser_classes = [MultiPartParser, FormParser]
 
+    def get_cache_scopes(self):
+        # Products embed their category names, so every response depends on categories
+        if self.action == 'retrieve':
+            pk = str(self.kwargs['pk'])
+            company_id = cache.get_product_company_id(pk) if pk.isdigit() else None
+            if company_id is None:
+                return None
+            return [cache.company_scope(company_id), cache.CATEGORIES]
+
+        company = self.request.query_params.get('company', '')
+        if company.isdigit():
+            return [cache.company_scope(company), cache.CATEGORIES]
+        return [cache.CATALOG, cache.CATEGORIES]
+
+    # ?ordering= values and the materialized column they sort on
+    PRICE_ORDERINGS = {'price': 'effective_price', '-price': '-effective_price'}
+
+    @property
+    def paginator(self):
+        # Search results (by relevance) and price listings are not ordered by id
+        params = self.request.query_params
+        if not hasattr(self, '_paginator') and (
+            params.get(ProductSearchFilter.search_param)
+            or params.get('ordering') in self.PRICE_ORDERINGS
+        ):
+            self._paginator = SearchResultsPagination()
+        return super().paginator
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return ProductWriteSerializer
@@ -64,6 +110,20 @@ class ProductViewSet(viewsets.ModelViewSet):
         if category:
             queryset = queryset.filter(categories=category)
 
+        # Price filters and ordering use the materialized effective price (indexed per company)
+        min_price = self.request.query_params.get('min_price', None)
+        max_price = self.request.query_params.get('max_price', None)
+        ordering = self.request.query_params.get('ordering', None)
+        try:
+            if min_price:
+                queryset = queryset.filter(effective_price__gte=Decimal(min_price))
+            if max_price:
+                queryset = queryset.filter(effective_price__lte=Decimal(max_price))
+        except InvalidOperation:
+            raise ValidationError({'error': 'Precio inválido'})
+        if ordering in self.PRICE_ORDERINGS:
+            queryset = queryset.order_by(self.PRICE_ORDERINGS[ordering], 'id')
+
         return queryset
 
     def create(self, request, *args, **kwargs):
@@ -103,6 +163,31 @@ class ProductViewSet(viewsets.ModelViewSet):
             headers=headers
         )
 
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAuthenticated])
+    def import_csv(self, request):
+        """Bulk create/update products from a CSV file (see marketplace.imports)"""
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'Se requiere un archivo CSV en el campo "file"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Only the owner of the company can import products into it
+        company_id = str(request.data.get('company', ''))
+        company = Company.objects.filter(
+            pk=company_id,
+            user=request.user
+        ).first() if company_id.isdigit() else None
+        if not company:
+            return Response(
+                {'error': 'Se requiere especificar una empresa válida'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = import_products_csv(upload, company)
+        return Response(result)
+
     @action(detail=True, methods=['get'])
     def calculate_price(self, request, pk=None):
         product = self.get_object()